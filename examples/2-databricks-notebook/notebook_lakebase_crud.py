@@ -135,18 +135,16 @@ items_to_create = [
     {"name": "Keyboard", "description": "Mechanical wireless", "price": 149.99, "quantity": 50},
 ]
 
-created_ids = []
-for item_data in items_to_create:
-    resp = requests.post(
-        f"{APP_URL}/api/v1/lakebase/items",
-        headers=headers,
-        json=item_data,
-    )
-    result = resp.json()
-    item_id = result.get("item", {}).get("id")
-    created_ids.append(item_id)
-    item = result.get("item", {})
-    print(f"Created [{resp.status_code}]: id={item_id}, name={item_data['name']}, created_by={item.get('created_by')}, auth_mode={item.get('auth_mode')}")
+# One request / one transaction for the whole batch (see POST /items:bulk)
+resp = requests.post(
+    f"{APP_URL}/api/v1/lakebase/items:bulk",
+    headers=headers,
+    json={"items": items_to_create},
+)
+result = resp.json()
+created_ids = [item["id"] for item in result.get("items", [])]
+for item_data, item_id in zip(items_to_create, created_ids):
+    print(f"Created [{resp.status_code}]: id={item_id}, name={item_data['name']}, created_by={result.get('created_by')}, auth_mode={result.get('auth_mode')}")
 
 print(f"\nCreated item IDs: {created_ids}")
 
@@ -278,6 +276,7 @@ else:
 # MAGIC | Health check | `/api/v1/lakebase/health` | GET | Any |
 # MAGIC | Init table | `/api/v1/lakebase/init-table` | POST | Any |
 # MAGIC | Create item | `/api/v1/lakebase/items` | POST | User or SP |
+# MAGIC | Bulk create items | `/api/v1/lakebase/items:bulk` | POST | User or SP |
 # MAGIC | List items | `/api/v1/lakebase/items` | GET | User or SP |
 # MAGIC | Get item | `/api/v1/lakebase/items/{id}` | GET | User or SP |
 # MAGIC | Update item | `/api/v1/lakebase/items/{id}` | PUT | User or SP |
@@ -2,9 +2,18 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 
+import config.deadlines as deadlines
+import config.health as health
+import config.idempotency as idempotency
+import config.item_events as item_events
+import config.item_feed as item_feed
+import config.item_partitions as item_partitions
 import config.lakebase as lakebase
+import config.metrics as metrics
+import config.profiling as profiling
+import config.tracing as tracing
 from routes import api_router
 
 logger = logging.getLogger(__name__)
@@ -16,6 +25,10 @@ async def lifespan(app: FastAPI):
         try:
             lakebase.init_engine()
             await lakebase.start_token_refresh()
+            await item_events.start_listener()
+            await idempotency.start_cleanup()
+            await item_feed.start_pruning()
+            await item_partitions.start_maintenance()
             logger.info("Lakebase connection initialized")
         except Exception as e:
             lakebase.startup_error = f"{type(e).__name__}: {e}"
@@ -23,9 +36,19 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Lakebase not configured — LAKEBASE_INSTANCE_NAME not set")
 
+    await health.start_prober()
+    await tracing.start_exporter()
+
     yield
 
+    await tracing.stop_exporter()
+    await health.stop_prober()
+    await idempotency.stop_cleanup()
+    await item_feed.stop_pruning()
+    await item_partitions.stop_maintenance()
+    await item_events.stop_listener()
     await lakebase.stop_token_refresh()
+    metrics.mark_worker_stopped()
     logger.info("Application shutdown complete")
 
 
@@ -34,11 +57,25 @@ app = FastAPI(
     description="A FastAPI application deployed on Databricks Apps with User Authorization",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=metrics.TimedJSONResponse,
 )
 
+# Innermost: profiles cover the routed handler only
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(deadlines.DeadlineMiddleware)
+# Added last, so it wraps the deadline middleware and sees its 504s
+app.add_middleware(metrics.MetricsMiddleware)
+# Outermost: the server span covers everything else
+app.add_middleware(tracing.TracingMiddleware)
 app.include_router(api_router)
 
 
+@app.exception_handler(deadlines.DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: deadlines.DeadlineExceeded):
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled error on {request.method} {request.url.path}: {exc}", exc_info=True)
@@ -51,3 +88,9 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.get("/")
 async def root():
     return RedirectResponse(url="/api/v1/healthcheck")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,31 @@
+"""Lazily resolved Databricks SDK configuration.
+
+Constructing ``databricks.sdk.core.Config`` resolves authentication (env vars,
+profiles, metadata service) and importing the SDK itself is expensive, so
+nothing here runs at import time. Routes call ``get_config()`` on first use and
+every later call returns the cached instance.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from databricks.sdk.core import Config
+
+
+@lru_cache(maxsize=1)
+def get_config() -> "Config":
+    """Return the app's SP ``Config``, resolving auth on the first call only."""
+    from databricks.sdk.core import Config
+
+    return Config()
+
+
+def get_host() -> str:
+    """Workspace URL (``https://...``) without a trailing slash."""
+    return get_config().host.rstrip("/")
+
+
+def get_server_hostname() -> str:
+    """Workspace hostname as expected by the databricks-sql connector."""
+    return get_host().removeprefix("https://")
@@ -0,0 +1,221 @@
+"""Per-request deadlines.
+
+Every routed request gets a deadline: the ``X-Request-Timeout`` header
+(seconds, capped at REQUEST_MAX_TIMEOUT) if the client sent one, otherwise the
+route's default, REQUEST_TIMEOUT unless the route declares its own with
+``@route_timeout(...)`` (None: no deadline, e.g. streaming routes). The
+deadline lives in a context var and bounds every layer the request waits on:
+
+  - Postgres: pooled connections open with statement_timeout =
+    REQUEST_TIMEOUT, which already bounds requests on the default deadline.
+    A transaction opened by a request whose time left differs from that by
+    more than _CANCEL_GRACE (a tighter X-Request-Timeout, a longer or no
+    route deadline) starts with ``SET LOCAL statement_timeout`` = the time
+    left, so the server abandons the statement itself (config/lakebase.py)
+  - asyncpg: calls made on the raw connection take ``timeout(...)`` (the time
+    left, at most their usual timeout) instead of a fixed command timeout
+  - warehouse queries are cancelled when the time runs out (routes/v1/trips.py)
+  - outbound HTTP calls use ``timeout(...)`` as their client timeout
+
+``check()`` raises DeadlineExceeded before starting work that can no longer
+finish in time. As a backstop, DeadlineMiddleware cancels a request still running
+_CANCEL_GRACE seconds past its deadline. Both that and a 500 raised once the
+deadline has passed, typically a statement cancelled by statement_timeout, are
+answered 504, because the client has stopped waiting by then anyway.
+
+Optional env vars:
+  - REQUEST_TIMEOUT: default deadline in seconds for routes without their own (default 30)
+  - REQUEST_MAX_TIMEOUT: largest deadline a client can ask for with X-Request-Timeout (default 600)
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))
+MAX_TIMEOUT = float(os.getenv("REQUEST_MAX_TIMEOUT", "600"))
+HEADER = "x-request-timeout"
+# The middleware cuts a request off this long after its deadline, so statements
+# stopped by statement_timeout fail cleanly first instead of being cancelled
+# client-side (which costs the pooled connection).
+_CANCEL_GRACE = 1.0
+
+# statement_timeout every pooled connection opens with (see config/lakebase.py)
+CONNECTION_STATEMENT_TIMEOUT_MS = math.ceil(DEFAULT_TIMEOUT * 1000)
+
+_stats = {"exceeded": 0, "cancelled": 0}
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before (or while) doing some work."""
+
+
+class _Deadline:
+    """Deadline state of one request, shared by everything running on its behalf."""
+
+    __slots__ = ("expires_at", "timer")
+
+    def __init__(self):
+        self.expires_at: float | None = None  # time.monotonic(); None until routed, or no deadline
+        self.timer: asyncio.Timeout | None = None
+
+
+_current: ContextVar[_Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def route_timeout(seconds: float | None):
+    """Endpoint decorator declaring the route's default deadline (None: no deadline).
+
+    Apply it below the router decorator so the router registers the marked function.
+    """
+    def mark(endpoint: Callable) -> Callable:
+        endpoint.request_timeout = seconds
+        return endpoint
+    return mark
+
+
+async def route_deadline(request: Request):
+    """Router dependency: start the request's deadline once its route is known."""
+    state = _current.get()
+    if state is None:
+        return
+    raw = request.headers.get(HEADER)
+    if raw is not None:
+        try:
+            seconds = float(raw)
+        except ValueError:
+            seconds = math.nan
+        if not 0 < seconds < math.inf:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a positive number of seconds")
+        seconds = min(seconds, MAX_TIMEOUT)
+    else:
+        seconds = getattr(request.scope.get("endpoint"), "request_timeout", DEFAULT_TIMEOUT)
+    if seconds is None:
+        return
+    state.expires_at = time.monotonic() + seconds
+    if state.timer is not None:
+        state.timer.reschedule(asyncio.get_running_loop().time() + seconds + _CANCEL_GRACE)
+
+
+def expires_at() -> float | None:
+    """The current request's deadline as a time.monotonic() value, or None."""
+    state = _current.get()
+    return None if state is None else state.expires_at
+
+
+def remaining() -> float | None:
+    """Seconds left before the current request's deadline (negative once passed), or None."""
+    deadline = expires_at()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(what: str = "request"):
+    """Raise DeadlineExceeded if the current request's deadline has passed."""
+    if expired():
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+
+
+def timeout(default: float | None = None) -> float | None:
+    """Timeout for a call made now: the time left, at most ``default``.
+
+    Raises DeadlineExceeded if no time is left. Without a deadline, returns ``default``.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return left if default is None else min(left, default)
+
+
+def detach():
+    """Drop the request deadline in the current context.
+
+    For tasks that a request starts but that outlive it or serve other
+    requests too (they inherit a copy of the request's context).
+    """
+    _current.set(None)
+
+
+def statement_timeout_ms() -> int | None:
+    """``statement_timeout`` to set for a transaction starting now, or None to keep the connection's.
+
+    0 (no limit) in a request without a deadline. The connection default is
+    kept outside requests and when the time left is within _CANCEL_GRACE of
+    it, which saves a round trip per transaction for most requests.
+    """
+    state = _current.get()
+    if state is None:
+        return None
+    if state.expires_at is None:
+        return 0
+    # Raises once expired: 0 would disable statement_timeout rather than fail fast
+    left_ms = max(1, math.ceil(timeout() * 1000))
+    if abs(left_ms - CONNECTION_STATEMENT_TIMEOUT_MS) <= _CANCEL_GRACE * 1000:
+        return None
+    return left_ms
+
+
+class DeadlineMiddleware:
+    """Set up the per-request deadline state and enforce it (ASGI middleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = _Deadline()
+        token = _current.set(state)
+        started = False
+
+        async def send_with_deadline(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                if message["status"] in (500, 504) and expired():
+                    _stats["exceeded"] += 1
+                    message = {**message, "status": 504}
+            await send(message)
+
+        try:
+            async with asyncio.timeout(None) as timer:
+                state.timer = timer
+                await self.app(scope, receive, send_with_deadline)
+        except TimeoutError:
+            if not timer.expired():
+                raise  # some other timeout inside the app, not this request's deadline
+            _stats["cancelled"] += 1
+            logger.warning(f"Cancelled {scope['method']} {scope['path']} past its deadline")
+            if started:
+                return  # too late for a status; the response ends unfinished
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": json.dumps({"detail": "Request deadline exceeded"}).encode(),
+            })
+        finally:
+            _current.reset(token)
+
+
+def stats() -> Dict[str, Any]:
+    return {**_stats, "default_timeout": DEFAULT_TIMEOUT, "max_timeout": MAX_TIMEOUT}
@@ -0,0 +1,150 @@
+"""Group commit for service-principal single-item inserts.
+
+With LAKEBASE_GROUP_COMMIT enabled, ``create_item`` hands SP-path rows to
+``submit()`` instead of opening its own session. Rows arriving within
+LAKEBASE_GROUP_COMMIT_WINDOW_MS of the first one (or until
+LAKEBASE_GROUP_COMMIT_MAX_ROWS are waiting) are written by one multi-row
+INSERT ... RETURNING in one transaction on one pooled connection, and each
+caller gets its own row back. At most LAKEBASE_GROUP_COMMIT_MAX_IN_FLIGHT
+batches commit at once; rows arriving meanwhile form the next batch, so batches
+grow with load instead of every window taking a connection of its own. Under
+light load a request waits at most one window longer before its insert starts.
+
+If a batch fails, its rows are retried one at a time, so a single bad row only
+fails its own request. A caller that disconnects while waiting does not
+withdraw its row, but rows whose request deadline (config/deadlines.py) passed
+or whose request was cancelled before their batch started are dropped. The
+batch transaction itself runs without any one request's deadline.
+
+Optional env vars:
+  - LAKEBASE_GROUP_COMMIT: "true" to enable (default "false")
+  - LAKEBASE_GROUP_COMMIT_WINDOW_MS: collection window in milliseconds (default 5)
+  - LAKEBASE_GROUP_COMMIT_MAX_ROWS: flush as soon as this many rows are waiting (default 100)
+  - LAKEBASE_GROUP_COMMIT_MAX_IN_FLIGHT: concurrent batch transactions (default 2)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Set
+
+from sqlalchemy import insert
+
+import config.deadlines as deadlines
+import config.tracing as tracing
+from config.lakebase import get_sp_session
+from models.items import Item
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("LAKEBASE_GROUP_COMMIT", "false").lower() == "true"
+WINDOW = float(os.getenv("LAKEBASE_GROUP_COMMIT_WINDOW_MS", "5")) / 1000
+MAX_ROWS = int(os.getenv("LAKEBASE_GROUP_COMMIT_MAX_ROWS", "100"))
+MAX_IN_FLIGHT = int(os.getenv("LAKEBASE_GROUP_COMMIT_MAX_IN_FLIGHT", "2"))
+
+# (row, caller's future, caller's deadline as time.monotonic() or None)
+_pending: List[tuple[Dict[str, Any], asyncio.Future, float | None]] = []
+_flush_timer: asyncio.TimerHandle | None = None
+_flush_tasks: Set[asyncio.Task] = set()
+_stats = {"batches": 0, "rows": 0, "largest_batch": 0, "fallbacks": 0, "abandoned": 0}
+
+
+async def _insert_rows(rows: List[Dict[str, Any]]) -> List[Item]:
+    session = await get_sp_session()
+    try:
+        result = await session.execute(
+            insert(Item).returning(Item, sort_by_parameter_order=True), rows,
+        )
+        items = result.scalars().all()
+        await session.commit()
+        return items
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+async def _flush(batch: List[tuple[Dict[str, Any], asyncio.Future]]):
+    # The task inherits the context of the request that triggered it
+    deadlines.detach()
+    tracing.detach()
+    try:
+        items = await _insert_rows([row for row, _ in batch])
+    except Exception as e:
+        if len(batch) == 1:
+            if not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        _stats["fallbacks"] += 1
+        logger.warning(f"Group commit of {len(batch)} rows failed, retrying individually: {e}")
+        # One after another, inside this batch's in-flight slot: retrying them
+        # concurrently would take up to MAX_ROWS pooled connections at once
+        for entry in batch:
+            if not entry[1].done():
+                await _flush([entry])
+        return
+
+    _stats["batches"] += 1
+    _stats["rows"] += len(batch)
+    _stats["largest_batch"] = max(_stats["largest_batch"], len(batch))
+    for (_, future), item in zip(batch, items):
+        if not future.done():
+            future.set_result(item)
+
+
+def _flush_done(task: asyncio.Task):
+    _flush_tasks.discard(task)
+    # Rows that queued up behind the in-flight batches go next, without waiting a window
+    if _pending:
+        _start_flush()
+
+
+def _start_flush():
+    global _pending, _flush_timer
+    if _flush_timer is not None:
+        _flush_timer.cancel()
+        _flush_timer = None
+    if len(_flush_tasks) >= MAX_IN_FLIGHT:
+        return  # picked up by _flush_done
+    now = time.monotonic()
+    live = []
+    for entry in _pending:
+        _, future, expires_at = entry
+        if future.done():
+            _stats["abandoned"] += 1  # the request was cancelled while waiting
+        elif expires_at is not None and expires_at <= now:
+            _stats["abandoned"] += 1
+            future.set_exception(deadlines.DeadlineExceeded("Deadline exceeded before group commit"))
+        else:
+            live.append(entry)
+    batch = [(row, future) for row, future, _ in live[:MAX_ROWS]]
+    _pending = live[MAX_ROWS:]
+    if batch:
+        task = asyncio.create_task(_flush(batch))
+        _flush_tasks.add(task)
+        task.add_done_callback(_flush_done)
+
+
+async def submit(row: Dict[str, Any]) -> Item:
+    """Queue one row for the next group commit and wait for its inserted Item."""
+    global _flush_timer
+    deadlines.check("group commit")
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _pending.append((row, future, deadlines.expires_at()))
+    if len(_pending) >= MAX_ROWS:
+        _start_flush()
+    elif _flush_timer is None:
+        _flush_timer = loop.call_later(WINDOW, _start_flush)
+    return await future
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": ENABLED,
+        **_stats,
+        "avg_batch": round(_stats["rows"] / _stats["batches"], 2) if _stats["batches"] else None,
+        "pending": len(_pending),
+    }
@@ -0,0 +1,178 @@
+"""Background dependency prober with a cached health snapshot.
+
+A single task probes Lakebase, the SQL warehouse and the workspace REST API
+every HEALTH_PROBE_INTERVAL seconds and records status + latency. Health
+endpoints read the cached snapshot, so liveness/readiness probes never touch
+the connection pool. A live probe can be forced with ``probe_now()``; forced
+probes are rate-limited to one per HEALTH_DEEP_PROBE_MIN_INTERVAL seconds and
+concurrent callers share the in-flight probe.
+
+Optional env vars:
+  - HEALTH_PROBE_INTERVAL: seconds between background probes (default 30)
+  - HEALTH_PROBE_TIMEOUT: per-dependency timeout in seconds (default 5)
+  - HEALTH_DEEP_PROBE_MIN_INTERVAL: minimum seconds between forced probes (default 5)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+import requests as http_requests
+
+import config.lakebase as lakebase
+from config.databricks import get_config, get_host
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "30"))
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+DEEP_PROBE_MIN_INTERVAL = float(os.getenv("HEALTH_DEEP_PROBE_MIN_INTERVAL", "5"))
+
+# Dependencies whose failure makes the app not ready to serve traffic.
+# The warehouse and workspace API are reported but only degrade single routes.
+READINESS_DEPENDENCIES = ("lakebase",)
+
+_snapshot: Dict[str, Dict[str, Any]] = {}
+_last_probe: float = 0  # time.monotonic() of the last completed probe
+_probe_lock = asyncio.Lock()
+_prober_task: asyncio.Task | None = None
+
+
+def _result(status: str, started: float | None = None, **extra: Any) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2) if started else None,
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+        **extra,
+    }
+
+
+async def _probe_lakebase() -> Dict[str, Any]:
+    if not lakebase.is_configured():
+        return _result("not_configured")
+    started = time.perf_counter()
+    try:
+        check = await asyncio.wait_for(lakebase.health_check(), timeout=PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return _result("unhealthy", started, error=f"Timed out after {PROBE_TIMEOUT}s",
+                       engine_initialized=lakebase.engine is not None)
+    return _result(
+        "healthy" if check["healthy"] else "unhealthy", started,
+        error=check["error"], engine_initialized=check["engine_initialized"],
+    )
+
+
+def _get_workspace_api(path: str) -> http_requests.Response:
+    """Blocking GET against the workspace REST API as the app's SP."""
+    return http_requests.get(
+        f"{get_host()}{path}",
+        headers=get_config().authenticate(),
+        timeout=PROBE_TIMEOUT,
+    )
+
+
+async def _call_workspace_api(path: str) -> http_requests.Response:
+    # The outer timeout also bounds SDK auth resolution, which retries internally.
+    resp = await asyncio.wait_for(asyncio.to_thread(_get_workspace_api, path), timeout=PROBE_TIMEOUT)
+    resp.raise_for_status()
+    return resp
+
+
+async def _probe_warehouse() -> Dict[str, Any]:
+    warehouse_id = os.environ.get("DATABRICKS_WAREHOUSE_ID")
+    if not warehouse_id:
+        return _result("not_configured")
+    started = time.perf_counter()
+    try:
+        resp = await _call_workspace_api(f"/api/2.0/sql/warehouses/{warehouse_id}")
+        # A STOPPED warehouse is still reachable; it auto-starts on the first query.
+        return _result("healthy", started, warehouse_state=resp.json().get("state"), error=None)
+    except Exception as e:
+        return _result("unhealthy", started, error=f"{type(e).__name__}: {e}")
+
+
+async def _probe_workspace() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        await _call_workspace_api("/api/2.0/preview/scim/v2/Me")
+        return _result("healthy", started, error=None)
+    except Exception as e:
+        return _result("unhealthy", started, error=f"{type(e).__name__}: {e}")
+
+
+async def run_probes() -> Dict[str, Dict[str, Any]]:
+    """Probe every dependency concurrently and replace the cached snapshot."""
+    global _snapshot, _last_probe
+    lakebase_result, warehouse_result, workspace_result = await asyncio.gather(
+        _probe_lakebase(), _probe_warehouse(), _probe_workspace(),
+    )
+    _snapshot = {
+        "lakebase": lakebase_result,
+        "warehouse": warehouse_result,
+        "workspace": workspace_result,
+    }
+    _last_probe = time.monotonic()
+    return _snapshot
+
+
+async def probe_now() -> tuple[Dict[str, Dict[str, Any]], bool]:
+    """Force a live probe unless one completed within DEEP_PROBE_MIN_INTERVAL.
+
+    Returns (snapshot, probed) where probed is False if the call was rate-limited
+    and the cached snapshot was returned instead.
+    """
+    if _snapshot and time.monotonic() - _last_probe < DEEP_PROBE_MIN_INTERVAL:
+        return _snapshot, False
+    async with _probe_lock:
+        # Another request may have finished a probe while we waited for the lock.
+        if _snapshot and time.monotonic() - _last_probe < DEEP_PROBE_MIN_INTERVAL:
+            return _snapshot, False
+        return await run_probes(), True
+
+
+def get_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return the cached per-dependency results (empty until the first probe)."""
+    return _snapshot
+
+
+def snapshot_age() -> float | None:
+    """Seconds since the last completed probe, or None if none has run yet."""
+    return round(time.monotonic() - _last_probe, 3) if _snapshot else None
+
+
+def is_ready() -> bool:
+    """True once a probe has run and no readiness dependency is unhealthy."""
+    if not _snapshot:
+        return False
+    return all(_snapshot[name]["status"] != "unhealthy" for name in READINESS_DEPENDENCIES)
+
+
+async def _probe_background():
+    while True:
+        try:
+            async with _probe_lock:
+                await run_probes()
+        except Exception as e:
+            logger.error(f"Dependency probe failed: {e}")
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def start_prober():
+    global _prober_task
+    if _prober_task is None or _prober_task.done():
+        _prober_task = asyncio.create_task(_probe_background())
+        logger.info(f"Dependency prober started (interval={PROBE_INTERVAL}s)")
+
+
+async def stop_prober():
+    global _prober_task
+    if _prober_task and not _prober_task.done():
+        _prober_task.cancel()
+        try:
+            await _prober_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Dependency prober stopped")
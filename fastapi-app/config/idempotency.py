@@ -0,0 +1,172 @@
+"""Idempotency-Key support for item writes.
+
+A write sent with an ``Idempotency-Key`` header first claims the key with an
+``INSERT ... ON CONFLICT`` into ``idempotency_keys`` inside its own transaction,
+then stores its response in that row before committing. So:
+
+  - a retry after the write committed gets the stored response back and the
+    write is not executed again
+  - a retry (or duplicate) arriving while the first attempt is still running
+    blocks on the key's unique index until that transaction ends, then replays
+    its response, or runs the write itself if the first attempt rolled back
+  - failed writes leave no row behind, so they can be retried with the same key
+
+Keys are scoped to the caller (``created_by`` identity), and a key reused with
+a different method, path or body is rejected. Stored responses are replayed
+for LAKEBASE_IDEMPOTENCY_TTL_HOURS; a background task deletes expired rows.
+
+Optional env vars:
+  - LAKEBASE_IDEMPOTENCY_TTL_HOURS: how long a stored response is replayed (default 24)
+  - LAKEBASE_IDEMPOTENCY_CLEANUP_INTERVAL: seconds between deletes of expired keys (default 3600)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.lakebase import get_sp_session
+from models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+TTL_HOURS = int(os.getenv("LAKEBASE_IDEMPOTENCY_TTL_HOURS", "24"))
+CLEANUP_INTERVAL = float(os.getenv("LAKEBASE_IDEMPOTENCY_CLEANUP_INTERVAL", "3600"))
+MAX_KEY_LENGTH = 255
+CLEANUP_BATCH_SIZE = 10000
+
+_cleanup_task: asyncio.Task | None = None
+_stats = {"claimed": 0, "replayed": 0, "expired_deleted": 0}
+
+
+class KeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+class KeyInProgress(Exception):
+    """The key's row exists but holds no response (written outside this module)."""
+
+
+def request_hash(method: str, path: str, body: Any) -> bytes:
+    payload = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{method} {path}\n{payload}".encode()).digest()
+
+
+async def claim(session: AsyncSession, caller: str, key: str, fingerprint: bytes) -> Dict[str, Any] | None:
+    """Reserve ``key`` in the session's transaction, or return its stored response.
+
+    Returns None if the caller should run the write and then call ``complete``
+    before committing; otherwise {"status_code", "body"} to send back as is.
+    Raises KeyReused if the stored request differs from ``fingerprint``.
+    """
+    stmt = pg_insert(IdempotencyKey).values(
+        caller=caller,
+        key=key,
+        request_hash=fingerprint,
+        expires_at=func.now() + func.make_interval(0, 0, 0, 0, TTL_HOURS),
+    )
+    # An expired row is taken over as if it were absent; a live one is left
+    # alone. Either way a concurrent holder of the key makes this statement
+    # wait until its transaction ends.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.caller, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": None,
+            "response": None,
+            "created_at": func.now(),
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=IdempotencyKey.expires_at <= func.now(),
+    ).returning(IdempotencyKey.key)
+    if (await session.execute(stmt)).first() is not None:
+        _stats["claimed"] += 1
+        return None
+
+    stored = (await session.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response)
+        .where(IdempotencyKey.caller == caller, IdempotencyKey.key == key)
+    )).one()
+    if bytes(stored.request_hash) != fingerprint:
+        raise KeyReused(key)
+    if stored.status_code is None:
+        raise KeyInProgress(key)
+    _stats["replayed"] += 1
+    return {"status_code": stored.status_code, "body": stored.response}
+
+
+async def complete(session: AsyncSession, caller: str, key: str, status_code: int, body: Dict[str, Any]):
+    """Store the response for a key claimed in this session's transaction."""
+    await session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.caller == caller, IdempotencyKey.key == key)
+        .values(status_code=status_code, response=body)
+    )
+
+
+async def delete_expired() -> int:
+    """Delete expired keys in batches; returns the number of rows removed."""
+    removed = 0
+    while True:
+        session = await get_sp_session()
+        try:
+            expired = (
+                select(IdempotencyKey.caller, IdempotencyKey.key)
+                .where(IdempotencyKey.expires_at <= func.now())
+                .limit(CLEANUP_BATCH_SIZE)
+            )
+            result = await session.execute(
+                delete(IdempotencyKey).where(
+                    tuple_(IdempotencyKey.caller, IdempotencyKey.key).in_(expired)
+                )
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+        removed += result.rowcount
+        if result.rowcount < CLEANUP_BATCH_SIZE:
+            break
+    _stats["expired_deleted"] += removed
+    return removed
+
+
+async def _cleanup_background():
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL)
+        try:
+            removed = await delete_expired()
+            if removed:
+                logger.info(f"Deleted {removed} expired idempotency keys")
+        except Exception as e:
+            logger.warning(f"Idempotency key cleanup failed: {e}")
+
+
+async def start_cleanup():
+    global _cleanup_task
+    if _cleanup_task is None or _cleanup_task.done():
+        _cleanup_task = asyncio.create_task(_cleanup_background())
+        logger.info(f"Idempotency key cleanup started (interval={CLEANUP_INTERVAL}s)")
+
+
+async def stop_cleanup():
+    global _cleanup_task
+    if _cleanup_task and not _cleanup_task.done():
+        _cleanup_task.cancel()
+        try:
+            await _cleanup_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Idempotency key cleanup stopped")
+
+
+def stats() -> Dict[str, Any]:
+    return {**_stats, "ttl_hours": TTL_HOURS}
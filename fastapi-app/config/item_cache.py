@@ -0,0 +1,134 @@
+"""In-process read-through cache for item rows and early list pages.
+
+Entries are evicted LRU once their estimated size exceeds
+LAKEBASE_CACHE_MAX_BYTES. Invalidation comes from the items NOTIFY trigger via
+config/item_events.py, so rows written by other workers, other app instances
+or jobs are dropped too:
+  - a change with ids drops those item entries and every cached list page
+  - a change without ids (bulk statements, TRUNCATE) or a listener RESET clears everything
+
+Writes made by this worker also call ``invalidate`` right after they commit,
+so a read that follows a write on the same worker never sees the old row or
+ETag while the notification is still on its way.
+
+The cache is only consulted while the LISTEN connection is up. A ``put`` is
+discarded if any invalidation happened after the caller read its
+``generation()``, so a read racing a concurrent write can't re-cache stale data.
+
+Only service-principal reads use the cache: user-scoped sessions go through
+PostgreSQL RBAC, which a shared cache would bypass.
+
+Optional env vars:
+  - LAKEBASE_CACHE_ENABLED: "false" disables the cache (default "true")
+  - LAKEBASE_CACHE_MAX_BYTES: approximate memory bound (default 64 MiB)
+  - LAKEBASE_CACHE_MAX_PAGE: list pages up to this page number are cached (default 3)
+"""
+
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable
+
+import config.item_events as item_events
+
+CACHE_ENABLED = os.getenv("LAKEBASE_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_BYTES = int(os.getenv("LAKEBASE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_PAGE = int(os.getenv("LAKEBASE_CACHE_MAX_PAGE", "3"))
+
+# key -> (value, estimated size); most recently used last
+_entries: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+_page_keys: set = set()  # subset of _entries keys, so writes don't scan every entry
+_bytes = 0
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def item_key(item_id: int) -> tuple:
+    return ("item", item_id)
+
+
+def page_key(params: Dict[str, Any]) -> tuple:
+    return ("page", tuple(sorted(params.items())))
+
+
+def usable() -> bool:
+    return CACHE_ENABLED and item_events.is_listening()
+
+
+def generation() -> int:
+    """Opaque token to pass to ``put`` so stale reads are not cached."""
+    return _generation
+
+
+def get(key: Hashable) -> Any | None:
+    entry = _entries.get(key)
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+    _entries.move_to_end(key)
+    _stats["hits"] += 1
+    return entry[0]
+
+
+def _drop(key: Hashable):
+    global _bytes
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        _bytes -= entry[1]
+        _page_keys.discard(key)
+
+
+def put(key: Hashable, value: Any, read_generation: int):
+    global _bytes
+    if read_generation != _generation or not usable():
+        return
+    # repr() length is a cheap proxy for the size of small dicts of scalars
+    size = len(repr(value))
+    if size > CACHE_MAX_BYTES:
+        return
+    _drop(key)
+    _entries[key] = (value, size)
+    _bytes += size
+    if key[0] == "page":
+        _page_keys.add(key)
+    while _bytes > CACHE_MAX_BYTES:
+        _drop(next(iter(_entries)))
+        _stats["evictions"] += 1
+
+
+def clear():
+    global _bytes, _generation
+    _entries.clear()
+    _page_keys.clear()
+    _bytes = 0
+    _generation += 1
+
+
+def invalidate(ids: Iterable[int] | None):
+    """Drop the given items and every cached list page; None clears everything."""
+    global _generation
+    _stats["invalidations"] += 1
+    if ids is None:
+        clear()
+        return
+    _generation += 1
+    for item_id in ids:
+        _drop(item_key(item_id))
+    for key in list(_page_keys):
+        _drop(key)
+
+
+def _on_item_change(event: Dict[str, Any]):
+    invalidate(event.get("ids"))
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "bytes": _bytes,
+        "max_bytes": CACHE_MAX_BYTES,
+        "active": usable(),
+    }
+
+
+item_events.subscribe(_on_item_change)
@@ -0,0 +1,114 @@
+"""Single LISTEN connection per worker, fanning item change events out in-process.
+
+One dedicated asyncpg connection (outside the pool) LISTENs on the channel
+fed by the items NOTIFY trigger (models/item_changes.py) and hands every
+decoded payload to the registered subscribers. Subscribers must be cheap and
+non-blocking; they run on the event loop inside asyncpg's notification callback.
+
+When the connection drops, subscribers receive ``{"op": "RESET", "ids": None}``
+because notifications sent while disconnected are lost; the listener then
+reconnects with backoff and sends another RESET once it is listening again.
+
+Optional env vars:
+  - LAKEBASE_LISTEN_ENABLED: set to "false" to never open the LISTEN connection
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List
+
+import config.lakebase as lakebase
+from models.item_changes import ITEM_CHANGES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+LISTEN_ENABLED = os.getenv("LAKEBASE_LISTEN_ENABLED", "true").lower() == "true"
+RESET_EVENT = {"op": "RESET", "ids": None}
+
+_subscribers: List[Callable[[Dict[str, Any]], None]] = []
+_listening = False
+_listener_task: asyncio.Task | None = None
+
+
+def subscribe(callback: Callable[[Dict[str, Any]], None]):
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[Dict[str, Any]], None]):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def is_listening() -> bool:
+    """True while the LISTEN connection is up, i.e. no change can go unseen."""
+    return _listening
+
+
+def _publish(event: Dict[str, Any]):
+    for callback in list(_subscribers):
+        try:
+            callback(event)
+        except Exception as e:
+            logger.error(f"Item change subscriber {callback!r} failed: {e}")
+
+
+def _on_notify(connection, pid, channel, payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Ignoring malformed {channel} payload: {payload[:200]}")
+        return
+    _publish(event)
+
+
+async def _listen_forever():
+    global _listening
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = await lakebase.connect_sp_raw("fastapi_lakebase_listener")
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda c: lost.set())
+            await conn.add_listener(ITEM_CHANGES_CHANNEL, _on_notify)
+            _listening = True
+            backoff = 1
+            _publish(RESET_EVENT)
+            logger.info(f"Listening for item changes on '{ITEM_CHANGES_CHANNEL}'")
+            await lost.wait()
+            logger.warning("Item change listener connection lost")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Item change listener failed: {e}")
+        finally:
+            if _listening:
+                _listening = False
+                _publish(RESET_EVENT)
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def start_listener():
+    global _listener_task
+    if not LISTEN_ENABLED:
+        logger.info("Item change listener disabled (LAKEBASE_LISTEN_ENABLED=false)")
+        return
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_forever())
+        logger.info("Item change listener task started")
+
+
+async def stop_listener():
+    global _listener_task
+    if _listener_task and not _listener_task.done():
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Item change listener task stopped")
@@ -0,0 +1,261 @@
+"""Shared fan-out for the items change feed (Server-Sent Events).
+
+One pump task per worker reads new ``item_change_log`` rows and copies them
+into every subscriber's queue, so the database cost is one query per batch of
+changes rather than one per connected client. The pump wakes on item_events
+notifications (the worker's single LISTEN connection) and otherwise polls every
+LAKEBASE_FEED_POLL_INTERVAL seconds, which also picks up changes that were held
+back behind a long-running transaction. It stops when the last subscriber leaves.
+
+Change log rows older than LAKEBASE_FEED_RETENTION_HOURS are deleted in
+batches by a background task started at app startup, whether or not anyone
+is subscribed (every write appends to the log).
+
+Positions are (txid, seq) pairs of ``item_change_log`` rows, encoded as
+"<txid>-<seq>" tokens; see models/item_changes.py for why that order is safe.
+A subscriber whose queue fills up is cut off (its queue receives ``None``) and
+resumes from the database with its last token, so one slow client never
+blocks the others.
+
+Optional env vars:
+  - LAKEBASE_FEED_POLL_INTERVAL: seconds between polls without notifications (default 5)
+  - LAKEBASE_FEED_QUEUE_SIZE: buffered events per subscriber before it is cut off (default 1000)
+  - LAKEBASE_FEED_RETENTION_HOURS: change log rows older than this are pruned (default 24)
+  - LAKEBASE_FEED_PRUNE_INTERVAL: seconds between prunes of expired change log rows (default 3600)
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Set
+
+from sqlalchemy import delete, func, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config.deadlines as deadlines
+import config.item_events as item_events
+import config.tracing as tracing
+from config.lakebase import get_sp_session
+from models.item_changes import ItemChangeLog
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("LAKEBASE_FEED_POLL_INTERVAL", "5"))
+QUEUE_SIZE = int(os.getenv("LAKEBASE_FEED_QUEUE_SIZE", "1000"))
+RETENTION_HOURS = int(os.getenv("LAKEBASE_FEED_RETENTION_HOURS", "24"))
+PRUNE_INTERVAL = float(os.getenv("LAKEBASE_FEED_PRUNE_INTERVAL", "3600"))
+BATCH_SIZE = 500
+PRUNE_BATCH_SIZE = 10000
+
+Token = tuple[int, int]
+START_TOKEN: Token = (0, 0)
+
+# Transactions below this id have all finished, so their log rows are final.
+_HORIZON = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+_queues: Set[asyncio.Queue] = set()
+_cursor: Token | None = None  # last position handed to the queues
+_wake = asyncio.Event()
+_start_lock = asyncio.Lock()
+_pump_task: asyncio.Task | None = None
+_prune_task: asyncio.Task | None = None
+_stats = {"pruned": 0}
+
+
+def encode_token(token: Token) -> str:
+    return f"{token[0]}-{token[1]}"
+
+
+def decode_token(value: str) -> Token:
+    """Parse a "<txid>-<seq>" token; raises ValueError if malformed."""
+    txid, seq = value.split("-")
+    return int(txid), int(seq)
+
+
+def event_token(event: Dict[str, Any]) -> Token:
+    return event["txid"], event["seq"]
+
+
+async def read_changes(
+    session: AsyncSession, after: Token, until: Token | None = None, limit: int = BATCH_SIZE
+) -> List[Dict[str, Any]]:
+    """Final changes after ``after`` (and up to ``until``, inclusive), oldest first."""
+    position = tuple_(ItemChangeLog.txid, ItemChangeLog.seq)
+    stmt = (
+        select(ItemChangeLog)
+        .where(position > tuple_(*after), ItemChangeLog.txid < _HORIZON)
+        .order_by(ItemChangeLog.txid, ItemChangeLog.seq)
+        .limit(limit)
+    )
+    if until is not None:
+        stmt = stmt.where(position <= tuple_(*until))
+    rows = (await session.execute(stmt)).scalars().all()
+    return [
+        {
+            "txid": row.txid,
+            "seq": row.seq,
+            "op": row.op,
+            "id": row.item_id,
+            "changed_at": row.changed_at.isoformat(),
+        }
+        for row in rows
+    ]
+
+
+async def head_token(session: AsyncSession) -> Token:
+    """Position of the newest final change, or START_TOKEN if the log is empty."""
+    row = (await session.execute(
+        select(ItemChangeLog.txid, ItemChangeLog.seq)
+        .where(ItemChangeLog.txid < _HORIZON)
+        .order_by(ItemChangeLog.txid.desc(), ItemChangeLog.seq.desc())
+        .limit(1)
+    )).first()
+    return (row.txid, row.seq) if row else START_TOKEN
+
+
+async def token_retained(session: AsyncSession, token: Token) -> bool:
+    """False if the change at ``token`` was pruned, i.e. later changes may be gone too."""
+    if token == START_TOKEN:
+        return True
+    found = await session.scalar(
+        select(ItemChangeLog.seq).where(ItemChangeLog.txid == token[0], ItemChangeLog.seq == token[1])
+    )
+    return found is not None
+
+
+def _deliver(event: Dict[str, Any]):
+    for queue in list(_queues):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Make room for the cut-off marker; the client replays from its last token.
+            _queues.discard(queue)
+            queue.get_nowait()
+            queue.put_nowait(None)
+            logger.warning("Change feed subscriber fell behind and was disconnected")
+
+
+async def prune_expired() -> int:
+    """Delete change log rows older than RETENTION_HOURS in batches; returns the number removed."""
+    removed = 0
+    while True:
+        session = await get_sp_session()
+        try:
+            expired = (
+                select(ItemChangeLog.seq)
+                .where(ItemChangeLog.changed_at < func.now() - func.make_interval(0, 0, 0, 0, RETENTION_HOURS))
+                .limit(PRUNE_BATCH_SIZE)
+            )
+            result = await session.execute(delete(ItemChangeLog).where(ItemChangeLog.seq.in_(expired)))
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+        removed += result.rowcount
+        if result.rowcount < PRUNE_BATCH_SIZE:
+            break
+    _stats["pruned"] += removed
+    return removed
+
+
+async def _prune_background():
+    while True:
+        try:
+            removed = await prune_expired()
+            if removed:
+                logger.info(f"Pruned {removed} change log rows older than {RETENTION_HOURS}h")
+        except Exception as e:
+            logger.warning(f"Change log pruning failed: {e}")
+        await asyncio.sleep(PRUNE_INTERVAL)
+
+
+async def start_pruning():
+    global _prune_task
+    if _prune_task is None or _prune_task.done():
+        _prune_task = asyncio.create_task(_prune_background())
+        logger.info(f"Change log pruning started (interval={PRUNE_INTERVAL}s)")
+
+
+async def stop_pruning():
+    global _prune_task
+    if _prune_task and not _prune_task.done():
+        _prune_task.cancel()
+        try:
+            await _prune_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Change log pruning stopped")
+
+
+async def _pump():
+    global _cursor
+    # Started by whichever feed request subscribes first, but serves them all
+    deadlines.detach()
+    tracing.detach()
+    try:
+        while _queues:
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wake.clear()
+            session = await get_sp_session()
+            try:
+                while True:
+                    changes = await read_changes(session, _cursor)
+                    for event in changes:
+                        _cursor = event_token(event)
+                        _deliver(event)
+                    if len(changes) < BATCH_SIZE:
+                        break
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Change feed poll failed: {e}")
+            finally:
+                await session.close()
+    finally:
+        _cursor = None
+
+
+def _on_item_change(event: Dict[str, Any]):
+    _wake.set()
+
+
+async def subscribe() -> tuple[asyncio.Queue, Token]:
+    """Register a subscriber queue and return it with the position it is live from.
+
+    Every change after the returned position is put on the queue; changes up
+    to and including it must be replayed with ``read_changes``.
+    """
+    global _cursor, _pump_task
+    async with _start_lock:
+        if _cursor is None:
+            session = await get_sp_session()
+            try:
+                _cursor = await head_token(session)
+            finally:
+                await session.close()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        _queues.add(queue)
+        if _pump_task is None or _pump_task.done():
+            _pump_task = asyncio.create_task(_pump())
+        return queue, _cursor
+
+
+def unsubscribe(queue: asyncio.Queue):
+    _queues.discard(queue)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "subscribers": len(_queues),
+        "position": encode_token(_cursor) if _cursor else None,
+        **_stats,
+        "retention_hours": RETENTION_HOURS,
+    }
+
+
+item_events.subscribe(_on_item_change)
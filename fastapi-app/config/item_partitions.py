@@ -0,0 +1,269 @@
+"""Monthly range partitions of ``items`` on ``created_at``, with archival.
+
+With LAKEBASE_ITEMS_PARTITIONED enabled, init-table creates ``items`` as a
+partitioned table (models/items.py ITEM_PARTITIONED_TABLE) with one
+partition per month (``items_pYYYY_MM``) plus ``items_default`` for rows
+outside every month range, e.g. historical ``created_at`` values written by
+other tools. Queries are unchanged: filters and keyset seeks on
+``created_at`` are pruned to the matching partitions, and the indexes
+declared on Item are created per partition, so the current month's indexes
+stay small.
+
+Every LAKEBASE_ITEMS_PARTITION_CHECK_INTERVAL seconds each worker runs
+``maintain()`` under an advisory lock:
+  - partitions are created for the current month and the next
+    LAKEBASE_ITEMS_PARTITIONS_AHEAD months
+  - with LAKEBASE_ITEMS_RETENTION_MONTHS set, monthly partitions that ended
+    more than that many months ago are detached and moved to
+    LAKEBASE_ITEMS_ARCHIVE_SCHEMA, where they stay queryable (or can be
+    dumped and dropped)
+
+Detaching fires no DELETE triggers, so archival subtracts the partition from
+``item_counts``, drops its days from ``item_stats``, and publishes one
+``ARCHIVE`` change (NULL id) that clears item caches and tells change-feed
+clients to re-list. It is a no-op when ``items`` is a plain table.
+
+Optional env vars:
+  - LAKEBASE_ITEMS_PARTITIONED: "true" to create items partitioned (default "false")
+  - LAKEBASE_ITEMS_PARTITIONS_AHEAD: future monthly partitions kept ready (default 3)
+  - LAKEBASE_ITEMS_RETENTION_MONTHS: archive partitions older than this; 0 keeps all (default 0)
+  - LAKEBASE_ITEMS_ARCHIVE_SCHEMA: schema detached partitions move to (default "items_archive")
+  - LAKEBASE_ITEMS_PARTITION_CHECK_INTERVAL: seconds between maintenance runs (default 3600)
+"""
+
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import config.lakebase as lakebase
+from models.item_changes import ITEM_CHANGES_CHANNEL
+from models.items import ITEM_PARTITIONED_TABLE, LAKEBASE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED = os.getenv("LAKEBASE_ITEMS_PARTITIONED", "false").lower() == "true"
+PARTITIONS_AHEAD = int(os.getenv("LAKEBASE_ITEMS_PARTITIONS_AHEAD", "3"))
+RETENTION_MONTHS = int(os.getenv("LAKEBASE_ITEMS_RETENTION_MONTHS", "0"))
+ARCHIVE_SCHEMA = os.getenv("LAKEBASE_ITEMS_ARCHIVE_SCHEMA", "items_archive")
+CHECK_INTERVAL = float(os.getenv("LAKEBASE_ITEMS_PARTITION_CHECK_INTERVAL", "3600"))
+
+DEFAULT_PARTITION = "items_default"
+# Serializes maintenance across workers and instances (arbitrary constant)
+_ADVISORY_LOCK_KEY = 0x6974656D73
+# Archival waits at most this long for its brief exclusive lock on items, then
+# retries on the next run instead of queueing every items query behind it.
+_ARCHIVE_LOCK_TIMEOUT = "5s"
+_PARTITION_NAME = re.compile(r"^items_p(\d{4})_(\d{2})$")
+
+_maintenance_task: asyncio.Task | None = None
+_stats: Dict[str, Any] = {"last_run": None, "created": 0, "archived": 0, "errors": 0}
+
+
+def _month(day: date, offset: int = 0) -> date:
+    """First day of the month ``offset`` months after ``day``'s month."""
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"items_p{month:%Y_%m}"
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    relkind = await conn.scalar(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": f"{LAKEBASE_SCHEMA}.items"},
+    )
+    return relkind == "p"
+
+
+async def create_table(conn: AsyncConnection) -> bool:
+    """Create ``items`` partitioned if it doesn't exist yet; True if ``items`` is partitioned.
+
+    An existing plain table is left alone (converting it means rewriting it).
+    """
+    exists = await conn.scalar(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"{LAKEBASE_SCHEMA}.items"}
+    )
+    if not exists:
+        await conn.execute(CreateTable(ITEM_PARTITIONED_TABLE, if_not_exists=True))
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {LAKEBASE_SCHEMA}.{DEFAULT_PARTITION} "
+            f"PARTITION OF {LAKEBASE_SCHEMA}.items DEFAULT"
+        ))
+        logger.info("Created partitioned items table")
+        return True
+    partitioned = await is_partitioned(conn)
+    if not partitioned:
+        logger.warning("LAKEBASE_ITEMS_PARTITIONED is set but items already exists as a plain table")
+    return partitioned
+
+
+async def _partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name) ORDER BY 1"
+        ),
+        {"name": f"{LAKEBASE_SCHEMA}.items"},
+    )
+    return list(result.scalars())
+
+
+async def ensure_partitions(conn: AsyncConnection) -> List[str]:
+    """Create missing partitions for this month and PARTITIONS_AHEAD more; returns the names created."""
+    # The database clock, since created_at defaults to the database's now()
+    today = await conn.scalar(text("SELECT localtimestamp::date"))
+    existing = set(await _partitions(conn))
+    created = []
+    for offset in range(PARTITIONS_AHEAD + 1):
+        start = _month(today, offset)
+        name = partition_name(start)
+        if name in existing:
+            continue
+        try:
+            # Savepoint: e.g. rows for this month already sitting in the
+            # default partition make this fail without aborting the rest
+            async with conn.begin_nested():
+                await conn.execute(text(
+                    f"CREATE TABLE {LAKEBASE_SCHEMA}.{name} PARTITION OF {LAKEBASE_SCHEMA}.items "
+                    f"FOR VALUES FROM ('{start}') TO ('{_month(start, 1)}')"
+                ))
+            created.append(name)
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.error(f"Creating partition {name} failed: {e}")
+    if created:
+        logger.info(f"Created item partitions {created}")
+    return created
+
+
+async def _archive_partition(conn: AsyncConnection, name: str, start: date):
+    schema = LAKEBASE_SCHEMA
+    async with conn.begin():
+        await conn.execute(text(f"SET LOCAL lock_timeout = '{_ARCHIVE_LOCK_TIMEOUT}'"))
+        # Rolling up a whole month can outlast the connection's statement_timeout
+        await conn.execute(text("SET LOCAL statement_timeout = 0"))
+        # Freeze writes to this month only, so the rollup deltas match what is detached
+        await conn.execute(text(f"LOCK TABLE {schema}.{name} IN SHARE MODE"))
+        await conn.execute(text(f"""
+            INSERT INTO {schema}.item_counts AS c (created_by, n)
+            SELECT coalesce(created_by, ''), -count(*) FROM {schema}.{name} GROUP BY 1 ORDER BY 1
+            ON CONFLICT (created_by) DO UPDATE SET n = c.n + EXCLUDED.n
+        """))
+        await conn.execute(
+            text(f"DELETE FROM {schema}.item_stats WHERE day >= :start AND day < :end"),
+            {"start": start, "end": _month(start, 1)},
+        )
+        await conn.execute(text(
+            f"INSERT INTO {schema}.item_change_log (txid, op, item_id) "
+            "VALUES (pg_current_xact_id()::text::bigint, 'ARCHIVE', NULL)"
+        ))
+        await conn.execute(
+            text("SELECT pg_notify(:channel, json_build_object('op', 'ARCHIVE', 'ids', NULL)::text)"),
+            {"channel": ITEM_CHANGES_CHANNEL},
+        )
+        await conn.execute(text(f"ALTER TABLE {schema}.items DETACH PARTITION {schema}.{name}"))
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        await conn.execute(text(f"ALTER TABLE {schema}.{name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+    logger.info(f"Archived item partition {name} to schema {ARCHIVE_SCHEMA}")
+
+
+async def _expired_partitions(conn: AsyncConnection) -> List[tuple[str, date]]:
+    """Monthly partitions that ended RETENTION_MONTHS or more months before this month."""
+    if RETENTION_MONTHS <= 0:
+        return []
+    today = await conn.scalar(text("SELECT localtimestamp::date"))
+    cutoff = _month(today, -RETENTION_MONTHS)
+    expired = []
+    for name in await _partitions(conn):
+        match = _PARTITION_NAME.match(name)
+        if not match:
+            continue  # items_default and partitions not created here
+        start = date(int(match.group(1)), int(match.group(2)), 1)
+        if _month(start, 1) <= cutoff:
+            expired.append((name, start))
+    return expired
+
+
+async def maintain() -> Dict[str, List[str]]:
+    """Create upcoming partitions and archive expired ones (one worker at a time).
+
+    Each expired partition is archived in its own transaction; one that fails
+    (e.g. lock timeout) is retried on the next run.
+    """
+    created: List[str] = []
+    archived: List[str] = []
+    async with lakebase.engine.connect() as conn:
+        locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        await conn.commit()
+        if not locked:
+            return {"created": created, "archived": archived}
+        try:
+            async with conn.begin():
+                # Attaching a partition scans items_default for rows it would take
+                await conn.execute(text("SET LOCAL statement_timeout = 0"))
+                if not await is_partitioned(conn):
+                    return {"created": created, "archived": archived}
+                created = await ensure_partitions(conn)
+                expired = await _expired_partitions(conn)
+            for name, start in expired:
+                try:
+                    await _archive_partition(conn, name, start)
+                    archived.append(name)
+                except Exception as e:
+                    _stats["errors"] += 1
+                    logger.error(f"Archiving partition {name} failed: {e}")
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            await conn.commit()
+    _stats["last_run"] = datetime.now(timezone.utc).isoformat()
+    _stats["created"] += len(created)
+    _stats["archived"] += len(archived)
+    return {"created": created, "archived": archived}
+
+
+async def _maintain_background():
+    while True:
+        try:
+            await maintain()
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.warning(f"Item partition maintenance failed: {e}")
+        await asyncio.sleep(CHECK_INTERVAL)
+
+
+async def start_maintenance():
+    global _maintenance_task
+    if not PARTITIONED:
+        return
+    if _maintenance_task is None or _maintenance_task.done():
+        _maintenance_task = asyncio.create_task(_maintain_background())
+        logger.info(f"Item partition maintenance started (interval={CHECK_INTERVAL}s)")
+
+
+async def stop_maintenance():
+    global _maintenance_task
+    if _maintenance_task and not _maintenance_task.done():
+        _maintenance_task.cancel()
+        try:
+            await _maintenance_task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Item partition maintenance stopped")
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": PARTITIONED,
+        **_stats,
+        "partitions_ahead": PARTITIONS_AHEAD,
+        "retention_months": RETENTION_MONTHS,
+    }
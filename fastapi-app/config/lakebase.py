@@ -13,36 +13,103 @@ Optional env vars:
   - LAKEBASE_ENDPOINT: full endpoint resource path for credential generation
     (e.g. projects/my-proj/branches/br-xxx/endpoints/ep-xxx)
     If not set, auto-discovered from the host.
+  - WEB_CONCURRENCY: number of uvicorn worker processes (uvicorn's own
+    --workers default). When > 1, the SP credential, discovered endpoint and
+    username come from a file-locked cache shared by all workers (see
+    config/shared_state.py), and DB_POOL_SIZE / DB_MAX_OVERFLOW are treated as
+    per-instance budgets divided evenly across workers.
 """
 
 import asyncio
 import logging
 import os
 import time
+from typing import TYPE_CHECKING
 
-from databricks.sdk import WorkspaceClient
-from sqlalchemy import URL, event, text
+from sqlalchemy import URL, Engine, event, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     create_async_engine,
 )
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import deadlines, metrics, shared_state, tracing
+
+if TYPE_CHECKING:
+    # The SDK is heavy to import; it is loaded lazily in init_engine()/get_user_session().
+    from databricks.sdk import WorkspaceClient
 
 logger = logging.getLogger(__name__)
 
 engine: AsyncEngine | None = None
 AsyncSessionLocal: sessionmaker | None = None
 
-_workspace_client: WorkspaceClient | None = None
+_workspace_client: "WorkspaceClient | None" = None
 _endpoint_resource: str | None = None
 _postgres_password: str | None = None
 _last_password_refresh: float = 0
 _token_refresh_task: asyncio.Task | None = None
 startup_error: str | None = None
 
+TOKEN_REFRESH_INTERVAL = 50 * 60
+# Longest statement text recorded on SQL trace spans
+SQL_TRACE_MAX_LENGTH = 2000
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+@event.listens_for(Engine, "begin")
+def _apply_request_deadline(connection):
+    """Bound a request's transaction by its remaining time where that differs from the connection default."""
+    timeout_ms = deadlines.statement_timeout_ms()
+    if timeout_ms is not None:
+        connection.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {"timeout": f"{timeout_ms}ms"},
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_sql_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["sql_started"] = time.perf_counter()
+    span = tracing.start_span(
+        statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL",
+        tracing.KIND_CLIENT,
+        **{"db.system": "postgresql", "db.statement": statement[:SQL_TRACE_MAX_LENGTH]},
+    )
+    if span is not None:
+        conn.info["sql_span"] = span
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_sql_timer(conn, cursor, statement, parameters, context, executemany):
+    # Not called for failed statements; the next statement overwrites their start
+    started = conn.info.pop("sql_started", None)
+    if started is not None:
+        metrics.STAGE_DURATION.labels("sql_execution").observe(time.perf_counter() - started)
+    span = conn.info.pop("sql_span", None)
+    if span is not None:
+        span.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_sql_span(context):
+    if context.connection is not None:
+        span = context.connection.info.pop("sql_span", None)
+        if span is not None:
+            span.end(context.original_exception)
+
+
+class _TimedQueuePool(AsyncAdaptedQueuePool):
+    """Pool that records checkout waits (including opening new connections) as ``pool_checkout``."""
+
+    def connect(self):
+        with metrics.stage("pool_checkout"):
+            return super().connect()
 
-def _discover_endpoint(w: WorkspaceClient, host: str) -> str:
+
+def _discover_endpoint(w: "WorkspaceClient", host: str) -> str:
     """Find the endpoint resource path by matching the host against all endpoints."""
     ep_prefix = host.split(".")[0]
     logger.info(f"Discovering endpoint for host prefix: {ep_prefix}")
@@ -63,18 +130,64 @@ def _discover_endpoint(w: WorkspaceClient, host: str) -> str:
     )
 
 
-def _generate_credential(w: WorkspaceClient, endpoint: str) -> str:
+def _generate_credential(w: "WorkspaceClient", endpoint: str) -> str:
     """Generate a PostgreSQL OAuth credential using the postgres API."""
-    cred = w.postgres.generate_database_credential(endpoint=endpoint)
+    with metrics.stage("credential_generation"):
+        cred = w.postgres.generate_database_credential(endpoint=endpoint)
     return cred.token
 
 
+def _worker_share(total: int, minimum: int) -> int:
+    """Split a per-instance connection budget evenly across uvicorn workers."""
+    return max(minimum, total // WORKERS)
+
+
+def _refresh_shared_credential(previous: dict) -> dict:
+    """Build the shared SP state. Runs under the shared-state file lock."""
+    endpoint = (
+        os.getenv("LAKEBASE_ENDPOINT")
+        or previous.get("endpoint")
+        or _discover_endpoint(_workspace_client, os.getenv("LAKEBASE_HOST"))
+    )
+    username = (
+        os.getenv("DATABRICKS_CLIENT_ID")
+        or previous.get("username")
+        or _workspace_client.current_user.me().user_name
+    )
+    return {
+        "endpoint": endpoint,
+        "username": username,
+        "password": _generate_credential(_workspace_client, endpoint),
+    }
+
+
+def _load_shared_credential() -> dict:
+    """Adopt the shared SP state, regenerating it if it is due for refresh."""
+    global _endpoint_resource, _postgres_password, _last_password_refresh
+    state = shared_state.load_or_refresh(
+        scope=os.getenv("LAKEBASE_HOST"),
+        max_age=TOKEN_REFRESH_INTERVAL,
+        refresh=_refresh_shared_credential,
+    )
+    _endpoint_resource = state["endpoint"]
+    _postgres_password = state["password"]
+    _last_password_refresh = state["issued_at"]
+    return state
+
+
 async def _refresh_token_background():
     """Refresh the SP database credential every 50 minutes."""
     global _postgres_password, _last_password_refresh
     while True:
         try:
-            await asyncio.sleep(50 * 60)
+            if WORKERS > 1:
+                # Wake when the shared credential is due; whichever worker takes
+                # the lock first regenerates it, the rest just re-read the file.
+                due_in = _last_password_refresh + TOKEN_REFRESH_INTERVAL - time.time()
+                await asyncio.sleep(max(60, due_in))
+                await asyncio.to_thread(_load_shared_credential)
+                continue
+            await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
             logger.info("Refreshing Lakebase PostgreSQL OAuth token")
             _postgres_password = _generate_credential(_workspace_client, _endpoint_resource)
             _last_password_refresh = time.time()
@@ -87,6 +200,7 @@ def init_engine():
     """Create the async SQLAlchemy engine using SP credentials."""
     global engine, AsyncSessionLocal, _workspace_client, _endpoint_resource
     global _postgres_password, _last_password_refresh
+    from databricks.sdk import WorkspaceClient
 
     host = os.getenv("LAKEBASE_HOST")
     if not host:
@@ -94,20 +208,25 @@ def init_engine():
 
     _workspace_client = WorkspaceClient()
 
-    # Discover or use explicit endpoint resource path
-    _endpoint_resource = os.getenv("LAKEBASE_ENDPOINT")
-    if not _endpoint_resource:
-        _endpoint_resource = _discover_endpoint(_workspace_client, host)
+    if WORKERS > 1:
+        # Endpoint, username and credential come from the worker-shared cache
+        username = _load_shared_credential()["username"]
+    else:
+        # Discover or use explicit endpoint resource path
+        _endpoint_resource = os.getenv("LAKEBASE_ENDPOINT")
+        if not _endpoint_resource:
+            _endpoint_resource = _discover_endpoint(_workspace_client, host)
+
+        # Generate initial credential
+        _postgres_password = _generate_credential(_workspace_client, _endpoint_resource)
+        _last_password_refresh = time.time()
 
-    # Generate initial credential
-    _postgres_password = _generate_credential(_workspace_client, _endpoint_resource)
-    _last_password_refresh = time.time()
+        username = (
+            os.getenv("DATABRICKS_CLIENT_ID")
+            or _workspace_client.current_user.me().user_name
+        )
 
     database_name = os.getenv("LAKEBASE_DATABASE_NAME", "databricks_postgres")
-    username = (
-        os.getenv("DATABRICKS_CLIENT_ID")
-        or _workspace_client.current_user.me().user_name
-    )
 
     url = URL.create(
         drivername="postgresql+asyncpg",
@@ -120,15 +239,19 @@ def init_engine():
 
     engine = create_async_engine(
         url,
+        poolclass=_TimedQueuePool,
         pool_pre_ping=False,
         echo=False,
-        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
-        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_size=_worker_share(int(os.getenv("DB_POOL_SIZE", "5")), minimum=1),
+        max_overflow=_worker_share(int(os.getenv("DB_MAX_OVERFLOW", "10")), minimum=0),
         pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "10")),
         pool_recycle=int(os.getenv("DB_POOL_RECYCLE_INTERVAL", "3600")),
         connect_args={
             "command_timeout": int(os.getenv("DB_COMMAND_TIMEOUT", "30")),
-            "server_settings": {"application_name": "fastapi_lakebase_app"},
+            "server_settings": {
+                "application_name": "fastapi_lakebase_app",
+                "statement_timeout": str(deadlines.CONNECTION_STATEMENT_TIMEOUT_MS),
+            },
             "ssl": "require",
         },
     )
@@ -140,7 +263,10 @@ def init_engine():
     AsyncSessionLocal = sessionmaker(
         bind=engine, class_=AsyncSession, expire_on_commit=False,
     )
-    logger.info(f"Lakebase engine initialized: host={host}, db={database_name}, endpoint={_endpoint_resource}")
+    logger.info(
+        f"Lakebase engine initialized: host={host}, db={database_name}, "
+        f"endpoint={_endpoint_resource}, workers={WORKERS}"
+    )
 
 
 async def start_token_refresh():
@@ -161,6 +287,28 @@ async def stop_token_refresh():
         logger.info("Lakebase token refresh task stopped")
 
 
+async def connect_sp_raw(application_name: str):
+    """Open a dedicated (unpooled) asyncpg connection as the SP.
+
+    For long-lived connections that must not hold a pool slot, e.g. LISTEN.
+    Uses the engine's host/user/database and the current SP credential.
+    """
+    import asyncpg
+
+    if engine is None:
+        raise RuntimeError("Lakebase engine not initialized; call init_engine() first")
+    url = engine.url
+    return await asyncpg.connect(
+        host=url.host,
+        port=url.port,
+        user=url.username,
+        password=_postgres_password,
+        database=url.database,
+        ssl="require",
+        server_settings={"application_name": application_name},
+    )
+
+
 async def get_sp_session() -> AsyncSession:
     """Get a session using the SP connection pool."""
     if AsyncSessionLocal is None:
@@ -173,15 +321,20 @@ async def get_user_session(user_token: str) -> tuple[AsyncSession, str]:
 
     Returns (session, username) so the caller knows who the user is.
     """
+    from databricks.sdk import WorkspaceClient
+
     host = os.getenv("LAKEBASE_HOST")
     database_name = os.getenv("LAKEBASE_DATABASE_NAME", "databricks_postgres")
 
-    w = WorkspaceClient(
-        token=user_token,
-        host=_workspace_client.config.host,
-        auth_type="pat",
-    )
-    username = w.current_user.me().user_name
+    with metrics.stage("token_resolution"):
+        with tracing.span("WorkspaceClient"):
+            w = WorkspaceClient(
+                token=user_token,
+                host=_workspace_client.config.host,
+                auth_type="pat",
+            )
+        with tracing.span("current_user.me", tracing.KIND_CLIENT):
+            username = w.current_user.me().user_name
     password = _generate_credential(w, _endpoint_resource)
 
     url = URL.create(
@@ -195,11 +348,15 @@ async def get_user_session(user_token: str) -> tuple[AsyncSession, str]:
 
     user_engine = create_async_engine(
         url,
+        poolclass=_TimedQueuePool,
         pool_size=1,
         max_overflow=0,
         connect_args={
             "command_timeout": int(os.getenv("DB_COMMAND_TIMEOUT", "30")),
-            "server_settings": {"application_name": "fastapi_lakebase_user"},
+            "server_settings": {
+                "application_name": "fastapi_lakebase_user",
+                "statement_timeout": str(deadlines.CONNECTION_STATEMENT_TIMEOUT_MS),
+            },
             "ssl": "require",
         },
     )
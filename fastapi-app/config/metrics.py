@@ -0,0 +1,210 @@
+"""Prometheus metrics for requests and the stages they spend time in.
+
+MetricsMiddleware records, per request, labeled by route template (e.g.
+``/api/v1/lakebase/items/{item_id}``; ``unmatched`` for 404s) and the
+``auth_mode`` the route resolved (``none`` for routes that don't resolve one):
+
+  - http_requests_total{method, route, auth_mode, status}
+  - http_request_duration_seconds{method, route, auth_mode}: until the last body byte is sent
+  - http_request_size_bytes / http_response_size_bytes{method, route}: body bytes
+  - http_requests_in_flight{method, route}
+
+``stage()`` times a stage of the work, observed into
+app_stage_duration_seconds{stage} (one series per stage, across routes) and
+recorded as a span of the request's trace (config/tracing.py):
+
+  - token_resolution: resolving a user token to its identity (get_user_session)
+  - credential_generation: Lakebase OAuth credential generation (SP and user)
+  - scim: SCIM /Me calls
+  - pool_checkout: waiting for a pooled connection, including opening a new one
+  - sql_execution: each statement run through SQLAlchemy, until its result is available
+  - serialization: rendering JSON response bodies
+
+Everything is served at GET /metrics in the Prometheus text format. Each
+uvicorn worker keeps its own metrics; with WEB_CONCURRENCY > 1, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory so /metrics aggregates all
+workers (prometheus_client multiprocess mode).
+
+Optional env vars:
+  - PROMETHEUS_MULTIPROC_DIR: shared directory for multi-worker metrics (unset: per process)
+"""
+
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from fastapi.responses import JSONResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+
+import config.tracing as tracing
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+# Sub-request stages take micro- to milliseconds; the request histogram uses
+# prometheus_client's default buckets (5 ms to 10 s).
+_STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "auth_mode", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "auth_mode"],
+)
+REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "HTTP request body size", ["method", "route"], buckets=_SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=_SIZE_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ["method", "route"],
+    multiprocess_mode="livesum",
+)
+STAGE_DURATION = Histogram(
+    "app_stage_duration_seconds", "Time spent in a stage of request handling", ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+
+
+class _RequestLabels:
+    __slots__ = ("auth_mode", "in_flight")
+
+    def __init__(self):
+        self.auth_mode = "none"
+        self.in_flight = None  # the in-flight gauge child, once the route is known
+
+
+_current: ContextVar[_RequestLabels | None] = ContextVar("request_metrics", default=None)
+
+
+def route_template(scope) -> str:
+    """Full path template of the matched route, e.g. ``/api/v1/lakebase/items/{item_id}``."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Routes of included routers may carry their path relative to the include
+    # prefix; the prefix is whatever precedes the rendered route in the path.
+    try:
+        rendered = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return route.path
+    path = scope["path"]
+    if rendered and path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + route.path
+    return route.path
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into app_stage_duration_seconds{stage=name} and a trace span."""
+    started = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        STAGE_DURATION.labels(name).observe(time.perf_counter() - started)
+
+
+def records_auth_mode(resolver: Callable) -> Callable:
+    """Decorate a ``(request) -> (token, auth_mode)`` resolver to label the request with its auth_mode."""
+    @functools.wraps(resolver)
+    def wrapper(*args, **kwargs):
+        token, auth_mode = resolver(*args, **kwargs)
+        labels = _current.get()
+        if labels is not None:
+            labels.auth_mode = auth_mode
+        return token, auth_mode
+    return wrapper
+
+
+async def route_started(request: Request):
+    """Router dependency: count the request in flight under its route template."""
+    labels = _current.get()
+    if labels is not None and labels.in_flight is None:
+        labels.in_flight = IN_FLIGHT.labels(request.method, route_template(request.scope))
+        labels.in_flight.inc()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose body rendering is timed as the ``serialization`` stage."""
+
+    def render(self, content) -> bytes:
+        with stage("serialization"):
+            return super().render(content)
+
+
+class MetricsMiddleware:
+    """Record request count, latency, sizes and in-flight requests (ASGI middleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        labels = _RequestLabels()
+        token = _current.set(labels)
+        started = time.perf_counter()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            _current.reset(token)
+            if labels.in_flight is not None:
+                labels.in_flight.dec()
+            # The router stores the matched route in the (shared) scope
+            route = route_template(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, route, labels.auth_mode, str(status)).inc()
+            REQUEST_DURATION.labels(method, route, labels.auth_mode).observe(time.perf_counter() - started)
+            REQUEST_SIZE.labels(method, route).observe(request_bytes)
+            RESPONSE_SIZE.labels(method, route).observe(response_bytes)
+
+
+def render() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, and its content type."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the multiprocess aggregate on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
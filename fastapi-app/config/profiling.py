@@ -0,0 +1,251 @@
+"""On-demand statistical profiling of single requests.
+
+A request is profiled when it carries ``X-Profile: 1`` and its caller is an
+admin (its proxy-set ``x-forwarded-email`` is in PROFILE_ADMINS), or when it
+is picked at PROFILE_SAMPLE_RATIO (any caller). ProfilingMiddleware then
+samples the request's stacks every PROFILE_INTERVAL seconds from a separate
+thread until the response is sent:
+
+  - on the event loop thread, while the request's own task is running
+    (async handlers, dependencies, response serialization)
+  - on threadpool threads inside the request's endpoint (sync handlers such
+    as /trips; concurrent requests to the same sync route are sampled too)
+
+Samples are aggregated as collapsed stacks (``frame;frame;... count``, one
+frame per function), the input format of flamegraph.pl, speedscope and
+inferno. Each profile is written to PROFILE_DIR as ``<id>.folded`` plus a
+``<id>.json`` summary, keeping the newest PROFILE_MAX_FILES (a ring buffer
+shared by the workers), and its id is returned in the ``X-Profile-Id``
+response header. Admins list and download profiles at
+GET /api/v1/debug/profiles[/{profile_id}].
+
+Optional env vars:
+  - PROFILE_ADMINS: comma-separated emails allowed to use X-Profile and /debug/profiles (default: none)
+  - PROFILE_SAMPLE_RATIO: share of all requests profiled (default 0)
+  - PROFILE_INTERVAL: seconds between stack samples (default 0.005)
+  - PROFILE_DIR: directory profiles are stored in (default "/tmp/request_profiles")
+  - PROFILE_MAX_FILES: profiles kept, oldest deleted first (default 50)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+ADMINS = {e.strip().lower() for e in os.getenv("PROFILE_ADMINS", "").split(",") if e.strip()}
+SAMPLE_RATIO = float(os.getenv("PROFILE_SAMPLE_RATIO", "0"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/request_profiles")
+MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+HEADER = "x-profile"
+# Each profile runs its own sampler thread; beyond this many at once, requests
+# are served unprofiled.
+_MAX_ACTIVE = 4
+_PROFILE_ID = re.compile(r"^\d{13}-[0-9a-f]{8}$")
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+_SITE_PACKAGES = "site-packages" + os.sep
+
+_active = 0
+_stats = {"profiles": 0, "skipped": 0, "errors": 0}
+
+
+def is_admin(request: Request) -> bool:
+    email = request.headers.get("x-forwarded-email")
+    return bool(email) and email.lower() in ADMINS
+
+
+def _requested(scope) -> bool:
+    """Whether this request should be profiled: an admin's X-Profile, or sampled."""
+    if SAMPLE_RATIO > 0 and random.random() < SAMPLE_RATIO:
+        return True
+    if not ADMINS:
+        return False
+    headers = dict(scope["headers"])
+    if headers.get(HEADER.encode(), b"").strip() != b"1":
+        return False
+    email = headers.get(b"x-forwarded-email", b"").decode("latin-1").lower()
+    return email in ADMINS
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_APP_ROOT):
+        return filename[len(_APP_ROOT):]
+    index = filename.rfind(_SITE_PACKAGES)
+    if index >= 0:
+        return filename[index + len(_SITE_PACKAGES):]
+    if filename.startswith(_STDLIB):
+        return filename[len(_STDLIB):]
+    return filename
+
+
+def _collapse(frame, root) -> str | None:
+    """``root;...;frame`` labels of the stack from the ``root`` code object up, or None if not under it."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+        if code is root:
+            return ";".join(reversed(labels))
+        frame = frame.f_back
+    return None
+
+
+class _Sampler(threading.Thread):
+    """Sample the stacks running one request until stopped."""
+
+    def __init__(self, scope):
+        super().__init__(name="request-profiler", daemon=True)
+        self.scope = scope
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.loop_thread = threading.get_ident()
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(INTERVAL):
+            self._sample()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def _sample(self):
+        endpoint = getattr(self.scope.get("endpoint"), "__code__", None)
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.loop_thread:
+                if asyncio.current_task(self.loop) is not self.task:
+                    continue
+                stack = _collapse(frame, ProfilingMiddleware.__call__.__code__)
+            elif endpoint is not None and thread_id != self.ident:
+                stack = _collapse(frame, endpoint)
+            else:
+                continue
+            if stack is not None:
+                self.stacks[stack] += 1
+                self.samples += 1
+
+
+def _save(profile_id: str, summary: Dict[str, Any], stacks: Counter):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        f.write(folded)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(summary, f)
+    for old in _profile_ids()[MAX_FILES:]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + suffix))
+            except FileNotFoundError:
+                pass  # another worker got there first
+
+
+def _profile_ids() -> List[str]:
+    """Stored profile ids, newest first (ids start with their creation time)."""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    ids = [name[:-5] for name in names if name.endswith(".json") and _PROFILE_ID.match(name[:-5])]
+    return sorted(ids, reverse=True)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    profiles = []
+    for profile_id in _profile_ids():
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+                profiles.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue  # deleted or still being written
+    return profiles
+
+
+def profile_path(profile_id: str) -> str | None:
+    """Path of a stored profile's collapsed stacks, or None if there is no such profile."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it or are sampled (ASGI middleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if _active >= _MAX_ACTIVE:
+            _stats["skipped"] += 1
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{time.time_ns() // 1_000_000}-{os.urandom(4).hex()}"
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        _active += 1
+        sampler = _Sampler(scope)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _active -= 1
+            summary = {
+                "id": profile_id,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": INTERVAL * 1000,
+                "pid": os.getpid(),
+            }
+            try:
+                await asyncio.to_thread(_save, profile_id, summary, sampler.stacks)
+                _stats["profiles"] += 1
+            except Exception as e:
+                _stats["errors"] += 1
+                logger.warning(f"Saving profile {profile_id} failed: {e}")
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "active": _active,
+        "admins": len(ADMINS),
+        "sample_ratio": SAMPLE_RATIO,
+        "interval": INTERVAL,
+        "max_files": MAX_FILES,
+    }
@@ -0,0 +1,78 @@
+"""File-locked state shared by all uvicorn workers on one app instance.
+
+With ``--workers N`` every worker would otherwise discover the Lakebase
+endpoint, generate its own SP credential and run its own refresh loop. Instead
+workers go through ``load_or_refresh()``: the first worker to find the cached
+state missing or stale regenerates it while holding an exclusive ``flock``;
+the others block on the lock and then read the fresh copy.
+
+Optional env vars:
+  - LAKEBASE_SHARED_STATE_PATH: cache file (default /tmp/fastapi_lakebase_state.json).
+    A ``.lock`` file is created next to it. Both are created with mode 0600.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = os.getenv("LAKEBASE_SHARED_STATE_PATH", "/tmp/fastapi_lakebase_state.json")
+
+
+@contextmanager
+def _exclusive_lock():
+    fd = os.open(f"{STATE_PATH}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _read() -> Dict[str, Any]:
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write(state: Dict[str, Any]):
+    # Write-then-rename so a reader never sees a partially written file.
+    tmp_path = f"{STATE_PATH}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def load_or_refresh(
+    scope: str,
+    max_age: float,
+    refresh: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Return the shared state for ``scope``, regenerating it if older than ``max_age``.
+
+    ``refresh`` receives the previous state for the same scope (or ``{}``) so it
+    can reuse long-lived values such as the discovered endpoint, and returns the
+    new state. It runs under the lock, so at most one worker calls it at a time.
+    The returned dict carries ``issued_at`` (epoch seconds) set by the refresher.
+    """
+    with _exclusive_lock():
+        state = _read()
+        if state.get("scope") != scope:
+            state = {}
+        if state and time.time() - state.get("issued_at", 0) < max_age:
+            return state
+
+        state = refresh(state)
+        state.update(scope=scope, issued_at=time.time(), refreshed_by_pid=os.getpid())
+        _write(state)
+        logger.info(f"Shared Lakebase state refreshed by pid {os.getpid()}")
+        return state
@@ -0,0 +1,345 @@
+"""Lightweight request tracing with OpenTelemetry-compatible (OTLP/JSON) export.
+
+TracingMiddleware opens a server span per request and ``span()`` opens child
+spans around the steps a request waits on: the stages timed in
+config/metrics.py (user token resolution, credential generation, SCIM, pool
+checkout, serialization), the WorkspaceClient setup and ``current_user.me()``
+of the user path, and every SQL statement (config/lakebase.py).
+
+Trace context follows W3C Trace Context: an incoming ``traceparent`` header
+(sent by the browser proxy or a notebook) continues the caller's trace, and
+outbound SCIM calls carry ``traceparent`` on. Sampling is parent-based: a
+sampled caller's trace is always recorded, an unsampled one never (its
+context is still passed on), and requests without a ``traceparent`` are
+sampled at TRACE_SAMPLE_RATIO. Unsampled requests cost a context var lookup
+per instrumented step. Sampled responses carry ``traceresponse`` with the
+trace id.
+
+Finished spans are buffered (at most TRACE_MAX_QUEUE, newer spans are dropped
+beyond that) and exported every TRACE_EXPORT_INTERVAL seconds as one OTLP/JSON
+``ExportTraceServiceRequest`` per batch: appended as a line to TRACE_EXPORT_FILE
+(readable by the collector's otlpjsonfile receiver) and/or POSTed to
+TRACE_EXPORT_URL (an OTLP/HTTP endpoint such as http://collector:4318/v1/traces).
+Without either, tracing is off.
+
+Optional env vars:
+  - TRACE_EXPORT_FILE: file that OTLP/JSON batches are appended to
+  - TRACE_EXPORT_URL: OTLP/HTTP JSON traces endpoint
+  - TRACE_SAMPLE_RATIO: share of requests without a sampled parent that are traced (default 0.01)
+  - TRACE_EXPORT_INTERVAL: seconds between exports (default 5)
+  - TRACE_MAX_QUEUE: finished spans buffered between exports (default 10000)
+  - OTEL_SERVICE_NAME: service.name resource attribute (default "fastapi_lakebase_app")
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List
+
+import requests as http_requests
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+EXPORT_URL = os.getenv("TRACE_EXPORT_URL")
+ENABLED = bool(EXPORT_FILE or EXPORT_URL)
+SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.01"))
+EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "10000"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "fastapi_lakebase_app")
+EXPORT_TIMEOUT = 10
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+_STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+
+_finished: List["Span"] = []
+# Spans also end on threadpool threads (sync handlers, to_thread calls)
+_finished_lock = threading.Lock()
+_exporter_task: asyncio.Task | None = None
+_stats = {"spans": 0, "dropped": 0, "exported": 0, "export_errors": 0}
+
+
+class Span:
+    """One timed operation. Unsampled requests get a non-recording span that only carries context."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "recording",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, kind: int, recording: bool):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex() if recording else parent_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.recording = recording
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {}
+        self.error: str | None = None
+
+    def set(self, key: str, value: Any):
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def end(self, error: BaseException | None = None):
+        if not self.recording or self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        with _finished_lock:
+            if len(_finished) >= MAX_QUEUE:
+                _stats["dropped"] += 1
+                return
+            _stats["spans"] += 1
+            _finished.append(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.recording else '00'}"
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes: Any) -> Span | None:
+    """Start a child of the current span, or return None when the request isn't sampled.
+
+    The caller must ``end()`` it; use ``span()`` when the step is a block.
+    """
+    parent = _current.get()
+    if parent is None or not parent.recording:
+        return None
+    child = Span(parent.trace_id, parent.span_id, name, kind, True)
+    child.attributes.update(attributes)
+    return child
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any):
+    """Record the block as a child span of the current one (a no-op when unsampled)."""
+    child = start_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    else:
+        child.end()
+    finally:
+        _current.reset(token)
+
+
+def current_traceparent() -> str | None:
+    """``traceparent`` value for an outbound call made now, or None outside a trace."""
+    current = _current.get()
+    return current.traceparent() if current is not None else None
+
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add the current trace context to outbound request headers (in place)."""
+    traceparent = current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
+    return headers
+
+
+def detach():
+    """Leave the current trace, for tasks a request starts but that outlive it."""
+    _current.set(None)
+
+
+def _parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    match = _TRACEPARENT.match(value.strip().lower()) if value else None
+    if not match or match.group(1) == "ff":
+        return None
+    trace_id, parent_id = match.group(2), match.group(3)
+    if trace_id == _INVALID_TRACE_ID or parent_id == _INVALID_SPAN_ID:
+        return None
+    return trace_id, parent_id, bool(int(match.group(4), 16) & 1)
+
+
+def _server_span(scope) -> Span | None:
+    traceparent = None
+    for name, value in scope["headers"]:
+        if name == b"traceparent":
+            traceparent = value.decode("latin-1")
+            break
+    parent = _parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = None, None
+        sampled = random.random() < SAMPLE_RATIO
+        if not sampled:
+            return None
+        trace_id = os.urandom(16).hex()
+    return Span(trace_id, parent_id, scope["method"], KIND_SERVER, sampled)
+
+
+class TracingMiddleware:
+    """Open the server span of each request (ASGI middleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        server = _server_span(scope)
+        if server is None:
+            await self.app(scope, receive, send)
+            return
+        token = _current.set(server)
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server.recording:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"traceresponse", server.traceparent().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            if server.recording:
+                # Imported here: config.metrics imports this module for stage spans
+                from config.metrics import route_template
+
+                route = route_template(scope)
+                server.name = f"{scope['method']} {route}"
+                server.set("http.request.method", scope["method"])
+                server.set("url.path", scope["path"])
+                server.set("http.route", route)
+                server.set("http.response.status_code", status)
+                if error is None and status >= 500:
+                    server.error = f"HTTP {status}"
+                server.end(error)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    encoded = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in s.attributes.items()],
+    }
+    if s.parent_id:
+        encoded["parentSpanId"] = s.parent_id
+    if s.error:
+        encoded["status"] = {"code": _STATUS_ERROR, "message": s.error}
+    return encoded
+
+
+def _otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    """An OTLP ExportTraceServiceRequest in the protobuf JSON mapping."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(s) for s in spans],
+            }],
+        }],
+    }
+
+
+def _write(payload: bytes):
+    if EXPORT_FILE:
+        with open(EXPORT_FILE, "ab") as f:
+            f.write(payload + b"\n")
+    if EXPORT_URL:
+        resp = http_requests.post(
+            EXPORT_URL, data=payload, headers={"Content-Type": "application/json"}, timeout=EXPORT_TIMEOUT,
+        )
+        resp.raise_for_status()
+
+
+async def export() -> int:
+    """Export the buffered spans now; returns how many were sent."""
+    global _finished
+    with _finished_lock:
+        if not _finished:
+            return 0
+        batch, _finished = _finished, []
+    payload = json.dumps(_otlp_request(batch), separators=(",", ":")).encode()
+    try:
+        await asyncio.to_thread(_write, payload)
+    except Exception as e:
+        _stats["export_errors"] += 1
+        logger.warning(f"Trace export of {len(batch)} spans failed: {e}")
+        return 0
+    _stats["exported"] += len(batch)
+    return len(batch)
+
+
+async def _export_background():
+    while True:
+        await asyncio.sleep(EXPORT_INTERVAL)
+        await export()
+
+
+async def start_exporter():
+    global _exporter_task
+    if not ENABLED:
+        return
+    if _exporter_task is None or _exporter_task.done():
+        _exporter_task = asyncio.create_task(_export_background())
+        logger.info(f"Trace exporter started (ratio={SAMPLE_RATIO}, interval={EXPORT_INTERVAL}s)")
+
+
+async def stop_exporter():
+    global _exporter_task
+    if _exporter_task and not _exporter_task.done():
+        _exporter_task.cancel()
+        try:
+            await _exporter_task
+        except asyncio.CancelledError:
+            pass
+        await export()
+        logger.info("Trace exporter stopped")
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": ENABLED, **_stats, "sample_ratio": SAMPLE_RATIO, "buffered": len(_finished)}
@@ -0,0 +1,31 @@
+"""Stored responses for requests sent with an ``Idempotency-Key`` header.
+
+One row per (caller, key). The row is inserted in the same transaction as the
+write it guards and filled with the response before commit, so a key is either
+absent (the write rolled back and may be retried) or holds the response of a
+write that committed. ``request_hash`` (sha256 of method, path and body) keeps a
+reused key from replaying the response of a different request. Rows past
+``expires_at`` are ignored and deleted by config/idempotency.py.
+"""
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.items import LAKEBASE_SCHEMA, Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = {"schema": LAKEBASE_SCHEMA}
+
+    caller: Mapped[str] = mapped_column(String(255), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response: Mapped[Any | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
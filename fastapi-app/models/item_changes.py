@@ -0,0 +1,98 @@
+"""Change log and NOTIFY trigger that publish item changes to app workers.
+
+Every INSERT/UPDATE/DELETE/TRUNCATE statement on ``items`` sends one
+notification on ITEM_CHANGES_CHANNEL with payload
+``{"op": "INSERT"|"UPDATE"|"DELETE"|"TRUNCATE", "ids": [...] | null}``.
+``ids`` is null when the statement touched more than ITEM_CHANGES_MAX_IDS
+rows (NOTIFY payloads are capped at 8000 bytes) or on TRUNCATE; listeners
+treat that as "anything may have changed".
+
+The same trigger appends one ``item_change_log`` row per changed item (one
+row with a NULL item_id for TRUNCATE), stamped with the writing transaction's
+id. Rows from transactions older than the oldest one still running
+(``pg_snapshot_xmin``) are final, so readers that only consume up to that
+horizon in (txid, seq) order never skip a late-committing change; that
+ordering is what the change feed's resume token encodes.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.items import LAKEBASE_SCHEMA, Base
+
+ITEM_CHANGES_CHANNEL = "items_changes"
+ITEM_CHANGES_MAX_IDS = 500
+
+
+class ItemChangeLog(Base):
+    __tablename__ = "item_change_log"
+    __table_args__ = {"schema": LAKEBASE_SCHEMA}
+
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    txid: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    op: Mapped[str] = mapped_column(String(8), nullable=False)
+    item_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False, index=True
+    )
+
+# Run in order by /lakebase/init-table; each entry is one statement.
+# Formatted with {schema}, {channel} and {max_ids}.
+ITEM_NOTIFY_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION {schema}.items_notify_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        ids integer[];
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            INSERT INTO {schema}.item_change_log (txid, op, item_id)
+            VALUES (pg_current_xact_id()::text::bigint, TG_OP, NULL);
+            PERFORM pg_notify('{channel}', json_build_object('op', TG_OP, 'ids', NULL)::text);
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO {schema}.item_change_log (txid, op, item_id)
+            SELECT pg_current_xact_id()::text::bigint, TG_OP, id FROM old_rows ORDER BY id;
+            SELECT array_agg(id) INTO ids FROM (SELECT id FROM old_rows LIMIT {max_ids} + 1) s;
+        ELSE
+            INSERT INTO {schema}.item_change_log (txid, op, item_id)
+            SELECT pg_current_xact_id()::text::bigint, TG_OP, id FROM new_rows ORDER BY id;
+            SELECT array_agg(id) INTO ids FROM (SELECT id FROM new_rows LIMIT {max_ids} + 1) s;
+        END IF;
+        IF ids IS NULL THEN
+            RETURN NULL;  -- statement matched no rows
+        END IF;
+        IF array_length(ids, 1) > {max_ids} THEN
+            ids := NULL;
+        END IF;
+        PERFORM pg_notify('{channel}', json_build_object('op', TG_OP, 'ids', ids)::text);
+        RETURN NULL;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS items_notify_ins ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_notify_upd ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_notify_del ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_notify_trunc ON {schema}.items",
+    """
+    CREATE TRIGGER items_notify_ins AFTER INSERT ON {schema}.items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_notify_trg()
+    """,
+    """
+    CREATE TRIGGER items_notify_upd AFTER UPDATE ON {schema}.items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_notify_trg()
+    """,
+    """
+    CREATE TRIGGER items_notify_del AFTER DELETE ON {schema}.items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_notify_trg()
+    """,
+    """
+    CREATE TRIGGER items_notify_trunc AFTER TRUNCATE ON {schema}.items
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_notify_trg()
+    """,
+]
@@ -0,0 +1,93 @@
+"""Trigger-maintained row counters for the items table.
+
+``item_counts`` holds one row per ``created_by`` value (NULL is stored as '')
+so the total and per-creator counts are a tiny index scan instead of a full
+``count(*)``. Statement-level triggers with transition tables keep it exact:
+a bulk INSERT of 10k rows issues one upsert per distinct creator, not 10k.
+Every upsert feeds its rows in ``created_by`` order, so concurrent statements
+touching several creators lock their counter rows in the same order instead of
+deadlocking. Writes by the same creator still queue on that creator's row.
+"""
+
+from sqlalchemy import BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.items import LAKEBASE_SCHEMA, Base
+
+
+class ItemCount(Base):
+    __tablename__ = "item_counts"
+    __table_args__ = {"schema": LAKEBASE_SCHEMA}
+
+    created_by: Mapped[str] = mapped_column(String(255), primary_key=True)
+    n: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+# Run in order by /lakebase/init-table after create_all; each entry is one
+# statement. Formatted with {schema}.
+ITEM_COUNTS_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION {schema}.items_count_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM {schema}.item_counts;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            -- Only rows whose created_by actually changed move between counters
+            INSERT INTO {schema}.item_counts AS c (created_by, n)
+            SELECT k, sum(d) FROM (
+                SELECT coalesce(o.created_by, '') AS k, -1 AS d
+                FROM old_rows o JOIN new_rows nw USING (id)
+                WHERE o.created_by IS DISTINCT FROM nw.created_by
+                UNION ALL
+                SELECT coalesce(nw.created_by, ''), 1
+                FROM old_rows o JOIN new_rows nw USING (id)
+                WHERE o.created_by IS DISTINCT FROM nw.created_by
+            ) moved GROUP BY k ORDER BY k
+            ON CONFLICT (created_by) DO UPDATE SET n = c.n + EXCLUDED.n;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO {schema}.item_counts AS c (created_by, n)
+            SELECT coalesce(created_by, ''), -count(*) FROM old_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (created_by) DO UPDATE SET n = c.n + EXCLUDED.n;
+        ELSE
+            INSERT INTO {schema}.item_counts AS c (created_by, n)
+            SELECT coalesce(created_by, ''), count(*) FROM new_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (created_by) DO UPDATE SET n = c.n + EXCLUDED.n;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS items_count_ins ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_count_del ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_count_upd ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_count_trunc ON {schema}.items",
+    """
+    CREATE TRIGGER items_count_ins AFTER INSERT ON {schema}.items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_count_trg()
+    """,
+    """
+    CREATE TRIGGER items_count_del AFTER DELETE ON {schema}.items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_count_trg()
+    """,
+    """
+    CREATE TRIGGER items_count_upd AFTER UPDATE ON {schema}.items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_count_trg()
+    """,
+    """
+    CREATE TRIGGER items_count_trunc AFTER TRUNCATE ON {schema}.items
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_count_trg()
+    """,
+    # Rebuild from scratch; the lock keeps concurrent writers from slipping
+    # rows in between the recount and the trigger taking over.
+    "LOCK TABLE {schema}.items IN SHARE ROW EXCLUSIVE MODE",
+    "DELETE FROM {schema}.item_counts",
+    """
+    INSERT INTO {schema}.item_counts (created_by, n)
+    SELECT coalesce(created_by, ''), count(*) FROM {schema}.items GROUP BY 1
+    """,
+]
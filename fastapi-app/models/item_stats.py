@@ -0,0 +1,128 @@
+"""Trigger-maintained inventory rollup for the items table.
+
+``item_stats`` holds one row per (``created_by``, creation day) with the item
+count, total quantity and stock value (sum of price x quantity). Like
+``item_counts`` it is kept exact by statement-level triggers with transition
+tables, so ``/items/stats`` reads a table whose size grows with creators x days,
+not with items. Rows whose count drops to zero are left in place (and skipped
+by readers) until the next rebuild by init-table.
+Upserts run in (``created_by``, day) order, so concurrent bulk writes lock
+rollup rows in the same order and don't deadlock.
+"""
+
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Date, DateTime, Numeric, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.items import LAKEBASE_SCHEMA, Base
+
+
+class ItemStat(Base):
+    __tablename__ = "item_stats"
+    __table_args__ = {"schema": LAKEBASE_SCHEMA}
+
+    created_by: Mapped[str] = mapped_column(String(255), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    items: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    total_quantity: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # numeric so repeated +/- deltas don't accumulate float rounding error
+    stock_value: Mapped[float] = mapped_column(Numeric, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+# Run in order by /lakebase/init-table after create_all; each entry is one
+# statement. Formatted with {schema}.
+ITEM_STATS_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION {schema}.items_stats_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM {schema}.item_stats;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            -- Only rows whose rolled-up columns changed move anything
+            INSERT INTO {schema}.item_stats AS s (created_by, day, items, total_quantity, stock_value, updated_at)
+            SELECT k, d, sum(n), sum(q), sum(v), now() FROM (
+                SELECT coalesce(o.created_by, '') AS k, o.created_at::date AS d,
+                       -1 AS n, -o.quantity::bigint AS q, -(o.price::numeric * o.quantity) AS v
+                FROM old_rows o JOIN new_rows nw USING (id)
+                WHERE (o.created_by, o.created_at, o.price, o.quantity)
+                      IS DISTINCT FROM (nw.created_by, nw.created_at, nw.price, nw.quantity)
+                UNION ALL
+                SELECT coalesce(nw.created_by, ''), nw.created_at::date,
+                       1, nw.quantity, nw.price::numeric * nw.quantity
+                FROM old_rows o JOIN new_rows nw USING (id)
+                WHERE (o.created_by, o.created_at, o.price, o.quantity)
+                      IS DISTINCT FROM (nw.created_by, nw.created_at, nw.price, nw.quantity)
+            ) moved
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            ON CONFLICT (created_by, day) DO UPDATE SET
+                items = s.items + EXCLUDED.items,
+                total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+                stock_value = s.stock_value + EXCLUDED.stock_value,
+                updated_at = EXCLUDED.updated_at;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO {schema}.item_stats AS s (created_by, day, items, total_quantity, stock_value, updated_at)
+            SELECT coalesce(created_by, ''), created_at::date,
+                   -count(*), -sum(quantity), -sum(price::numeric * quantity), now()
+            FROM old_rows
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            ON CONFLICT (created_by, day) DO UPDATE SET
+                items = s.items + EXCLUDED.items,
+                total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+                stock_value = s.stock_value + EXCLUDED.stock_value,
+                updated_at = EXCLUDED.updated_at;
+        ELSE
+            INSERT INTO {schema}.item_stats AS s (created_by, day, items, total_quantity, stock_value, updated_at)
+            SELECT coalesce(created_by, ''), created_at::date,
+                   count(*), sum(quantity), sum(price::numeric * quantity), now()
+            FROM new_rows
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            ON CONFLICT (created_by, day) DO UPDATE SET
+                items = s.items + EXCLUDED.items,
+                total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+                stock_value = s.stock_value + EXCLUDED.stock_value,
+                updated_at = EXCLUDED.updated_at;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS items_stats_ins ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_stats_del ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_stats_upd ON {schema}.items",
+    "DROP TRIGGER IF EXISTS items_stats_trunc ON {schema}.items",
+    """
+    CREATE TRIGGER items_stats_ins AFTER INSERT ON {schema}.items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_stats_trg()
+    """,
+    """
+    CREATE TRIGGER items_stats_del AFTER DELETE ON {schema}.items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_stats_trg()
+    """,
+    """
+    CREATE TRIGGER items_stats_upd AFTER UPDATE ON {schema}.items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_stats_trg()
+    """,
+    """
+    CREATE TRIGGER items_stats_trunc AFTER TRUNCATE ON {schema}.items
+    FOR EACH STATEMENT EXECUTE FUNCTION {schema}.items_stats_trg()
+    """,
+    # Rebuild from scratch under the same lock as the item_counts rebuild.
+    "LOCK TABLE {schema}.items IN SHARE ROW EXCLUSIVE MODE",
+    "DELETE FROM {schema}.item_stats",
+    """
+    INSERT INTO {schema}.item_stats (created_by, day, items, total_quantity, stock_value)
+    SELECT coalesce(created_by, ''), created_at::date, count(*),
+           sum(quantity), sum(price::numeric * quantity)
+    FROM {schema}.items GROUP BY 1, 2
+    """,
+]
@@ -3,7 +3,8 @@
 import os
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, Integer, String, func
+from sqlalchemy import DateTime, Float, Index, Integer, MetaData, String, Table, func, literal_column, text
+from sqlalchemy.dialects import postgresql  # noqa: F401 -- registers func.to_tsvector & co.
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 LAKEBASE_SCHEMA = os.getenv("LAKEBASE_SCHEMA", "public")
@@ -31,3 +32,87 @@ class Item(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now(), onupdate=func.now(), nullable=False,
     )
+    # Bumped by the items_version trigger on every UPDATE (ITEM_VERSION_DDL);
+    # item ETags are "<id>-<version>".
+    version: Mapped[int] = mapped_column(Integer, server_default=text("1"), nullable=False)
+
+
+# Expressions the list indexes are built on. Queries must use these exact
+# expressions (no bind parameters inside) for the planner to match the index.
+# name sorts/filters in byte order so one index serves prefix ranges and ORDER BY.
+ITEM_NAME_C = Item.name.collate("C")
+# NULL created_by sorts/filters as '' so keyset row comparisons never see NULL.
+ITEM_CREATED_BY_KEY = func.coalesce(Item.created_by, literal_column("''"))
+
+# Full-text document for /items/search: name weighted above description. The
+# text search config is baked into the GIN index, so changing it means
+# dropping and recreating ix_items_search_tsv.
+SEARCH_CONFIG = "english"
+# Constants are inline SQL (text), not bind parameters, so the planner can
+# match query expressions against the index expression.
+_search_config = text(f"'{SEARCH_CONFIG}'::regconfig")
+ITEM_SEARCH_VECTOR = func.setweight(
+    func.to_tsvector(_search_config, Item.name), text("'A'"),
+).op("||")(
+    func.setweight(
+        func.to_tsvector(_search_config, func.coalesce(Item.description, text("''"))),
+        text("'B'"),
+    )
+)
+
+# Composite (sort key, id) indexes back keyset pagination and range filters on
+# non-unique sort keys. init-table creates these on existing tables too
+# (Index.create(checkfirst=True)).
+Index("ix_items_created_at_id", Item.created_at, Item.id)
+Index("ix_items_name_c_id", ITEM_NAME_C, Item.id)
+Index("ix_items_price_id", Item.price, Item.id)
+Index("ix_items_quantity_id", Item.quantity, Item.id)
+Index("ix_items_created_by_id", ITEM_CREATED_BY_KEY, Item.id)
+Index("ix_items_created_by_created_at_id", ITEM_CREATED_BY_KEY, Item.created_at, Item.id)
+
+# Search: GIN over the tsvector document ...
+Index("ix_items_search_tsv", ITEM_SEARCH_VECTOR, postgresql_using="gin")
+
+# ... plus pg_trgm indexes for fuzzy (typo-tolerant) matching. pg_trgm is not
+# available on every Postgres build, so these are plain DDL that init-table
+# runs only after CREATE EXTENSION pg_trgm succeeds. Formatted with {schema}.
+ITEM_TRGM_INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_items_name_trgm ON {schema}.items USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_items_description_trgm ON {schema}.items USING gin (description gin_trgm_ops)",
+]
+
+# Installed by init-table. A row trigger rather than the app's UPDATEs bumps
+# version, so writes from psql, jobs or other services change ETags too.
+# Formatted with {schema}.
+ITEM_VERSION_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION {schema}.items_version_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.version := OLD.version + 1;
+        RETURN NEW;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS items_version_upd ON {schema}.items",
+    """
+    CREATE TRIGGER items_version_upd BEFORE UPDATE ON {schema}.items
+    FOR EACH ROW EXECUTE FUNCTION {schema}.items_version_trg()
+    """,
+]
+
+# Created by init-table instead of create_all's plain table when
+# LAKEBASE_ITEMS_PARTITIONED is set (partitions are managed by
+# config/item_partitions.py). Postgres requires the partition key in every
+# unique constraint, so the primary key is (id, created_at); ids stay unique
+# through the sequence. The columns are copied from Item, so the two can't drift.
+def _partitioned_items_table() -> Table:
+    columns = [col._copy() for col in Item.__table__.columns]
+    for col in columns:
+        col.primary_key = col.name in ("id", "created_at")
+    return Table(
+        Item.__tablename__, MetaData(), *columns,
+        schema=LAKEBASE_SCHEMA, postgresql_partition_by="RANGE (created_at)",
+    )
+
+
+ITEM_PARTITIONED_TABLE = _partitioned_items_table()
@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from config.deadlines import route_deadline
+from config.metrics import route_started
 
 from .v1 import router as v1_router
 
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(route_deadline), Depends(route_started)])
 
 api_router.include_router(v1_router, prefix="/api/v1")
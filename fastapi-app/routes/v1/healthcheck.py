@@ -1,7 +1,11 @@
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
+
+import config.health as health
+import config.profiling as profiling
 
 from .me import get_user_info
 
@@ -18,6 +22,30 @@ async def healthcheck(request: Request) -> Dict[str, Any]:
     }
 
 
+@router.get("/health/live")
+async def liveness() -> Dict[str, Any]:
+    """Liveness probe: the process is up and the event loop is responsive. No I/O."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness() -> JSONResponse:
+    """Readiness probe served from the background prober's cached snapshot.
+
+    Returns 503 until the first probe completes or while a readiness
+    dependency (Lakebase, when configured) is unhealthy.
+    """
+    ready = health.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "snapshot_age_seconds": health.snapshot_age(),
+            "dependencies": health.get_snapshot(),
+        },
+    )
+
+
 @router.get("/debug/headers")
 async def debug_headers(request: Request) -> Dict[str, Any]:
     """Return all incoming headers — use to verify proxy behavior."""
@@ -32,3 +60,25 @@ async def debug_headers(request: Request) -> Dict[str, Any]:
         "auth_headers": auth_headers,
         "all_headers": dict(request.headers),
     }
+
+
+def _require_profile_admin(request: Request):
+    if not profiling.is_admin(request):
+        raise HTTPException(status_code=403, detail="Profiles are only available to PROFILE_ADMINS")
+
+
+@router.get("/debug/profiles")
+async def list_profiles(request: Request) -> List[Dict[str, Any]]:
+    """List stored request profiles, newest first (admins only)."""
+    _require_profile_admin(request)
+    return profiling.list_profiles()
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def download_profile(request: Request, profile_id: str) -> FileResponse:
+    """Download a profile as collapsed stacks for flamegraph.pl or speedscope (admins only)."""
+    _require_profile_admin(request)
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return FileResponse(path, media_type="text/plain", filename=f"profile-{profile_id}.folded")
@@ -11,19 +11,79 @@ that PostgreSQL role-based access control applies to the calling user.
 Otherwise, the SP connection pool is used.
 """
 
+import asyncio
+import base64
+import codecs
+import csv
+import hashlib
+import io
+import json
 import logging
-from typing import Any, Dict, List
+import operator
+import os
+import tempfile
+import zlib
+from datetime import date, datetime, timezone
+from typing import Any, AsyncIterator, Dict, List
 
-from fastapi import APIRouter, HTTPException, Request
-from pydantic import BaseModel
-from sqlalchemy import func, select, text
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import Date, DateTime, Numeric, Text, cast, delete, func, insert, literal, literal_column, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.lakebase import get_sp_session, get_user_session, health_check, is_configured
-from models.items import Base, Item
+import config.deadlines as deadlines
+import config.group_commit as group_commit
+import config.health as health
+import config.idempotency as idempotency
+import config.item_cache as item_cache
+import config.item_feed as item_feed
+import config.item_partitions as item_partitions
+import config.metrics as metrics
+import config.profiling as profiling
+import config.tracing as tracing
+from config.lakebase import get_sp_session, get_user_session, is_configured
+from models.item_changes import ITEM_CHANGES_CHANNEL, ITEM_CHANGES_MAX_IDS, ITEM_NOTIFY_DDL
+from models.item_counts import ITEM_COUNTS_DDL, ItemCount
+from models.item_stats import ITEM_STATS_DDL, ItemStat
+from models.items import (
+    ITEM_CREATED_BY_KEY,
+    ITEM_NAME_C,
+    ITEM_SEARCH_VECTOR,
+    ITEM_TRGM_INDEX_DDL,
+    ITEM_VERSION_DDL,
+    SEARCH_CONFIG,
+    Base,
+    Item,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["lakebase"])
 
+# Bulk create: max items per request, rows per multi-row INSERT, and the size
+# above which rows are loaded with COPY into a staging table instead.
+BULK_MAX_ITEMS = int(os.getenv("LAKEBASE_BULK_MAX_ITEMS", "10000"))
+BULK_INSERT_BATCH_SIZE = int(os.getenv("LAKEBASE_BULK_INSERT_BATCH_SIZE", "1000"))
+BULK_COPY_THRESHOLD = int(os.getenv("LAKEBASE_BULK_COPY_THRESHOLD", "2000"))
+# Largest page list_items will serve, in both offset and cursor modes.
+MAX_PAGE_SIZE = int(os.getenv("LAKEBASE_MAX_PAGE_SIZE", "500"))
+# Default total-count strategy for list_items: exact | estimated | maintained | none.
+DEFAULT_COUNT_STRATEGY = os.getenv("LAKEBASE_COUNT_STRATEGY", "exact")
+# Default renderer of list_items pages: app (Python builds the JSON) | db (Postgres does).
+DEFAULT_LIST_RENDER = os.getenv("LAKEBASE_LIST_RENDER", "app")
+# Bulk update/delete refuse (and roll back) statements touching more rows than this.
+BULK_MAX_AFFECTED = int(os.getenv("LAKEBASE_BULK_MAX_AFFECTED", "10000"))
+# Rows fetched per server-side cursor round trip by the streaming export.
+EXPORT_BATCH_SIZE = int(os.getenv("LAKEBASE_EXPORT_BATCH_SIZE", "5000"))
+# Import: rejected rows reported (and tolerated) per upload, and the timeout
+# for the COPY and merge statements, which may run far longer than DB_COMMAND_TIMEOUT
+# (also the import route's default request deadline).
+IMPORT_MAX_ERRORS = int(os.getenv("LAKEBASE_IMPORT_MAX_ERRORS", "1000"))
+IMPORT_TIMEOUT = float(os.getenv("LAKEBASE_IMPORT_TIMEOUT", "600"))
+# Seconds between SSE keep-alive comments on an idle change feed.
+FEED_HEARTBEAT = float(os.getenv("LAKEBASE_FEED_HEARTBEAT", "15"))
+
 
 # ---------------------------------------------------------------------------
 # Request / response schemas
@@ -36,6 +96,10 @@ class ItemCreate(BaseModel):
     quantity: int = 0
 
 
+class ItemBulkCreate(BaseModel):
+    items: List[ItemCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
+
 class ItemUpdate(BaseModel):
     name: str | None = None
     description: str | None = None
@@ -43,6 +107,22 @@ class ItemUpdate(BaseModel):
     quantity: int | None = None
 
 
+class ItemSelector(BaseModel):
+    """Rows targeted by a bulk update/delete: an id list, a filter, or both (ANDed).
+
+    ``filter`` maps a column to ``{op: value}``, e.g.
+    ``{"price": {"lt": 10}, "created_by": {"eq": "a@b.com"}}``.
+    Ops: eq, ne, lt, lte, gt, gte, in, prefix, is_null.
+    """
+    ids: List[int] | None = Field(default=None, max_length=BULK_MAX_AFFECTED)
+    filter: Dict[str, Dict[str, Any]] | None = None
+    max_affected: int | None = Field(default=None, ge=1, le=BULK_MAX_AFFECTED)
+
+
+class ItemBulkUpdate(ItemSelector):
+    set: ItemUpdate
+
+
 class ItemResponse(BaseModel):
     id: int
     name: str
@@ -53,6 +133,7 @@ class ItemResponse(BaseModel):
     updated_by: str | None
     created_at: str
     updated_at: str
+    version: int
 
     model_config = {"from_attributes": True}
 
@@ -61,6 +142,7 @@ class ItemResponse(BaseModel):
 # Token extraction (shared with trips.py)
 # ---------------------------------------------------------------------------
 
+@metrics.records_auth_mode
 def _extract_user_token(request: Request) -> tuple[str | None, str]:
     """Extract a user-scoped Databricks token from the request.
 
@@ -88,6 +170,7 @@ def _extract_user_token(request: Request) -> tuple[str | None, str]:
 
 async def _get_session(request: Request):
     """Return (session, auth_mode, user_email). Uses user-scoped session when token is present."""
+    deadlines.check("opening a database session")
     user_token, auth_mode = _extract_user_token(request)
     if user_token:
         session, user_email = await get_user_session(user_token)
@@ -116,9 +199,1063 @@ def _item_to_dict(item: Item) -> dict:
         "auth_mode": item.auth_mode,
         "created_at": item.created_at.isoformat() if item.created_at else None,
         "updated_at": item.updated_at.isoformat() if item.updated_at else None,
+        "version": item.version,
     }
 
 
+# Read path: list/get/search/export select the table's columns with Core and
+# map rows straight to response dicts, skipping ORM instances and the identity
+# map. Writes keep using the ORM and _item_to_dict, which produce the same shape.
+_ITEM_COLUMNS = tuple(Item.__table__.columns)
+_ITEM_FIELDS = tuple(col.name for col in _ITEM_COLUMNS)
+_ITEM_DATETIME_INDEXES = tuple(i for i, col in enumerate(_ITEM_COLUMNS) if isinstance(col.type, DateTime))
+_ITEM_DATETIME_FIELDS = tuple(_ITEM_FIELDS[i] for i in _ITEM_DATETIME_INDEXES)
+_row_etag_key = operator.itemgetter(_ITEM_FIELDS.index("id"), _ITEM_FIELDS.index("version"))
+
+
+async def _execute_core(session: AsyncSession, query):
+    """Run a Core select on the session's connection, bypassing ORM result loading."""
+    connection = await session.connection()
+    return await connection.execute(query)
+
+
+def _row_to_dict(row) -> dict:
+    """Response dict for a row that starts with _ITEM_COLUMNS (extra trailing columns are ignored)."""
+    item = dict(zip(_ITEM_FIELDS, row))
+    for field in _ITEM_DATETIME_FIELDS:
+        if item[field] is not None:
+            item[field] = item[field].isoformat()
+    return item
+
+
+def _row_values(row) -> list:
+    """Column values of an _ITEM_COLUMNS row with datetimes as ISO strings."""
+    values = list(row)
+    for i in _ITEM_DATETIME_INDEXES:
+        if values[i] is not None:
+            values[i] = values[i].isoformat()
+    return values
+
+
+# ---------------------------------------------------------------------------
+# Conditional request helpers (ETag / If-None-Match / If-Match)
+# ---------------------------------------------------------------------------
+
+def _item_etag(item_id: int, version: int) -> str:
+    return f'"{item_id}-{version}"'
+
+
+def _page_etag(versions: List[tuple[int, int]], total: int | None, next_cursor: str | None) -> str:
+    """Weak ETag over a list page: the (id, version) pairs plus total and cursor."""
+    digest = hashlib.sha1(json.dumps([versions, total, next_cursor]).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def _parse_etags(header: str) -> List[str] | None:
+    """Entity tags listed in an If-Match / If-None-Match header; None means '*'."""
+    if header.strip() == "*":
+        return None
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 response if If-None-Match already names ``etag`` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = _parse_etags(header)
+    if tags is None or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def _if_match_versions(request: Request, item_id: int) -> List[int] | None:
+    """Versions of ``item_id`` an If-Match header accepts; None if unconditional.
+
+    Strong comparison: weak tags and tags for other items never match, so an
+    If-Match with no usable tag yields [] and the caller answers 412.
+    """
+    header = request.headers.get("if-match")
+    if not header:
+        return None
+    tags = _parse_etags(header)
+    if tags is None:
+        return None  # '*': any existing version
+    prefix = f'"{item_id}-'
+    return [
+        int(tag[len(prefix):-1])
+        for tag in tags
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()
+    ]
+
+
+async def _precondition_failed(session: AsyncSession, item_id: int, versions: List[int] | None):
+    """Raise 412 if the row exists but the If-Match versions didn't match, else 404."""
+    if versions is not None:
+        current = await session.scalar(select(Item.version).where(Item.id == item_id))
+        if current is not None:
+            raise HTTPException(
+                status_code=412,
+                detail=f"Item {item_id} was modified; current ETag is {_item_etag(item_id, current)}",
+            )
+    raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+
+
+# ---------------------------------------------------------------------------
+# Idempotency-Key helpers
+# ---------------------------------------------------------------------------
+
+def _check_idempotency_key(key: str | None):
+    if key is not None and not 0 < len(key) <= idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1-{idempotency.MAX_KEY_LENGTH} characters",
+        )
+
+
+async def _claim_idempotency_key(
+    session: AsyncSession, request: Request, caller: str, key: str, body: BaseModel
+) -> Response | None:
+    """Claim ``key`` in the session's transaction, or return the replay of its stored response."""
+    fingerprint = idempotency.request_hash(request.method, request.url.path, body.model_dump(mode="json"))
+    try:
+        stored = await idempotency.claim(session, caller, key, fingerprint)
+    except idempotency.KeyReused:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key was already used for a different request"
+        )
+    except idempotency.KeyInProgress:
+        raise HTTPException(status_code=409, detail="Idempotency-Key has no stored response yet")
+    if stored is None:
+        return None
+    replay = JSONResponse(
+        stored["body"], status_code=stored["status_code"], headers={"Idempotent-Replayed": "true"}
+    )
+    item = stored["body"].get("item")
+    if item:
+        replay.headers["ETag"] = _item_etag(item["id"], item["version"])
+    return replay
+
+
+_BULK_COLUMNS = ("name", "description", "price", "quantity", "created_by", "auth_mode")
+
+
+async def _bulk_insert_values(session: AsyncSession, rows: List[dict]) -> List[Any]:
+    """Insert rows as batched multi-row INSERT ... RETURNING statements.
+
+    SQLAlchemy's insertmanyvalues batching groups BULK_INSERT_BATCH_SIZE rows per
+    statement; sort_by_parameter_order keeps RETURNING rows aligned with input.
+    """
+    stmt = insert(Item).returning(
+        Item.id, Item.created_at, Item.updated_at, sort_by_parameter_order=True,
+    )
+    result = await session.execute(
+        stmt, rows, execution_options={"insertmanyvalues_page_size": BULK_INSERT_BATCH_SIZE},
+    )
+    return result.all()
+
+
+async def _bulk_insert_copy(session: AsyncSession, rows: List[dict]) -> List[Any]:
+    """COPY rows into a transaction-scoped staging table, then INSERT ... SELECT.
+
+    The staging table is created through the session first so the transaction
+    is open before the raw asyncpg COPY runs on the same connection.
+    """
+    schema = Item.__table_args__["schema"]
+    await session.execute(text(
+        "CREATE TEMP TABLE items_bulk_stage ("
+        " ord INTEGER, name VARCHAR(255), description VARCHAR(1000),"
+        " price DOUBLE PRECISION, quantity INTEGER,"
+        " created_by VARCHAR(255), auth_mode VARCHAR(50)"
+        ") ON COMMIT DROP"
+    ))
+    conn = await session.connection()
+    raw_conn = (await conn.get_raw_connection()).driver_connection
+    await raw_conn.copy_records_to_table(
+        "items_bulk_stage",
+        records=[(ord_, *(row[c] for c in _BULK_COLUMNS)) for ord_, row in enumerate(rows)],
+        columns=("ord", *_BULK_COLUMNS),
+        timeout=deadlines.timeout(),
+    )
+    columns = ", ".join(_BULK_COLUMNS)
+    # RETURNING order isn't guaranteed, but ids are drawn from the sequence in
+    # ord order, so sorting by id gives the rows back in input order
+    result = await session.execute(text(
+        f"WITH inserted AS ("
+        f" INSERT INTO {schema}.items ({columns})"
+        f" SELECT {columns} FROM items_bulk_stage ORDER BY ord"
+        f" RETURNING id, created_at, updated_at"
+        f") SELECT * FROM inserted ORDER BY id"
+    ))
+    return result.all()
+
+
+_FILTER_OPS = {
+    "eq": lambda col, v: col == v,
+    "ne": lambda col, v: col != v,
+    "lt": lambda col, v: col < v,
+    "lte": lambda col, v: col <= v,
+    "gt": lambda col, v: col > v,
+    "gte": lambda col, v: col >= v,
+    "in": lambda col, v: col.in_(v),
+    "prefix": lambda col, v: col.startswith(v, autoescape=True),
+    "is_null": lambda col, v: col.is_(None) if v else col.is_not(None),
+}
+_STRING_ONLY_OPS = {"prefix"}
+
+
+def _coerce_filter_scalar(python_type: type, value: Any) -> Any:
+    """Check ``value`` against a column's Python type, converting where it is unambiguous."""
+    if value is None or isinstance(value, bool):
+        raise ValueError(f"expected {python_type.__name__}, got {value!r}")
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise ValueError("expected an ISO 8601 timestamp")
+        # asyncpg needs datetime objects; items timestamps are naive UTC
+        return _naive_utc(datetime.fromisoformat(value))
+    if python_type is str:
+        if not isinstance(value, str):
+            raise ValueError("expected a string")
+        return value
+    if python_type is int:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, (int, str)):
+            return int(value)
+        raise ValueError("expected an integer")
+    if python_type is float:
+        if isinstance(value, (int, float, str)):
+            return float(value)
+        raise ValueError("expected a number")
+    raise ValueError(f"unsupported column type {python_type.__name__}")
+
+
+def _coerce_filter_value(col, op: str, value: Any) -> Any:
+    """Validate a filter operand for ``col``; raises ValueError on a mismatch."""
+    if op == "is_null":
+        if not isinstance(value, bool):
+            raise ValueError("expected true or false")
+        return value
+    python_type = col.type.python_type
+    if op in _STRING_ONLY_OPS and python_type is not str:
+        raise ValueError(f"'{op}' only applies to text columns")
+    if op == "in":
+        if not isinstance(value, list) or not value:
+            raise ValueError("expected a non-empty list")
+        return [_coerce_filter_scalar(python_type, v) for v in value]
+    return _coerce_filter_scalar(python_type, value)
+
+
+def _build_item_filter(filter: Dict[str, Dict[str, Any]]) -> list:
+    """Translate a ``{column: {op: value}}`` filter into SQLAlchemy clauses."""
+    columns = Item.__table__.columns
+    clauses = []
+    for name, conditions in filter.items():
+        if name not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown filter column '{name}'")
+        col = columns[name]
+        for op, value in conditions.items():
+            if op not in _FILTER_OPS:
+                raise HTTPException(status_code=400, detail=f"Unknown filter op '{op}' for '{name}'")
+            try:
+                value = _coerce_filter_value(col, op, value)
+            except (TypeError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Bad value for {name}.{op}: {e}")
+            clauses.append(_FILTER_OPS[op](col, value))
+    return clauses
+
+
+def _selector_clauses(body: ItemSelector) -> list:
+    clauses = []
+    if body.ids is not None:
+        clauses.append(Item.id.in_(body.ids))
+    if body.filter:
+        clauses.extend(_build_item_filter(body.filter))
+    if not clauses:
+        raise HTTPException(status_code=400, detail="Provide 'ids' and/or a non-empty 'filter'")
+    return clauses
+
+
+def _per_id_results(requested: List[int] | None, affected: Dict[int, dict], status: str) -> List[dict]:
+    """One result per requested id (or per affected row when selecting by filter)."""
+    if requested is None:
+        return [{"id": item_id, "status": status, **extra} for item_id, extra in affected.items()]
+    return [
+        {"id": item_id, "status": status, **affected[item_id]} if item_id in affected
+        else {"id": item_id, "status": "not_found"}
+        for item_id in dict.fromkeys(requested)
+    ]
+
+
+def _max_affected(body: ItemSelector) -> int:
+    return body.max_affected or BULK_MAX_AFFECTED
+
+
+def _bounded_selection(body: ItemSelector, clauses: list):
+    """``id IN (...)`` for at most max_affected + 1 of the selected rows, locked in id order.
+
+    The statement touches at most one row beyond the limit, so an overly broad
+    filter is detected without rewriting (and firing triggers for) every match.
+    """
+    target = (
+        select(Item.id)
+        .where(*clauses)
+        .order_by(Item.id)
+        .limit(_max_affected(body) + 1)
+        .with_for_update()
+    )
+    return Item.id.in_(target)
+
+
+async def _enforce_max_affected(session: AsyncSession, body: ItemSelector, affected: int):
+    limit = _max_affected(body)
+    if affected > limit:
+        await session.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Selection matches more than {limit} rows (max_affected={limit}); rolled back",
+        )
+
+
+# Sort keys usable for keyset pagination. Each must be backed by an index on
+# (key, id) -- see models/items.py -- so a page costs O(page_size), not O(offset).
+_SORT_KEYS = {
+    "id": Item.id,
+    "name": ITEM_NAME_C,
+    "price": Item.price,
+    "quantity": Item.quantity,
+    "created_by": ITEM_CREATED_BY_KEY,
+    "created_at": Item.created_at,
+}
+
+# (created_by equality?, range-filtered column, sort keys) combinations that an
+# index in models/items.py serves as a single ordered range scan. list_items
+# rejects anything else rather than silently scanning and sorting the table.
+_ALL_SORTS = frozenset(_SORT_KEYS)
+_INDEXED_ACCESS_PATHS = [
+    (False, None, _ALL_SORTS),                      # pkey / ix_items_<sort>_id
+    (False, "name", {"name"}),                      # ix_items_name_c_id
+    (False, "price", {"price"}),                    # ix_items_price_id
+    (False, "quantity", {"quantity"}),              # ix_items_quantity_id
+    (False, "created_at", {"created_at"}),          # ix_items_created_at_id
+    (True, None, {"id", "created_by"}),             # ix_items_created_by_id
+    (True, None, {"created_at"}),                   # ix_items_created_by_created_at_id
+    (True, "created_at", {"created_at"}),           # ix_items_created_by_created_at_id
+]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """items timestamps are TIMESTAMP WITHOUT TIME ZONE (server-side now(), UTC)."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _prefix_range(expr, prefix: str) -> list:
+    """``expr`` starts with ``prefix``, as a sargable range (byte order / C collation)."""
+    clauses = [expr >= prefix]
+    last = ord(prefix[-1])
+    if last < 0x10FFFF:
+        # Surrogates can't be encoded; U+E000 is the next code point after U+D7FF
+        upper = 0xE000 if 0xD800 <= last + 1 <= 0xDFFF else last + 1
+        clauses.append(expr < prefix[:-1] + chr(upper))
+    else:
+        clauses.append(expr.startswith(prefix, autoescape=True))
+    return clauses
+
+
+def _list_filter_clauses(
+    name_prefix: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    min_quantity: int | None,
+    max_quantity: int | None,
+    created_by: str | None,
+    created_after: datetime | None,
+    created_before: datetime | None,
+    sort: str,
+) -> list:
+    """Build WHERE clauses for list_items, rejecting combinations no index serves."""
+    clauses, ranged = [], set()
+    if name_prefix:
+        clauses.extend(_prefix_range(ITEM_NAME_C, name_prefix))
+        ranged.add("name")
+    if min_price is not None:
+        clauses.append(Item.price >= min_price)
+        ranged.add("price")
+    if max_price is not None:
+        clauses.append(Item.price <= max_price)
+        ranged.add("price")
+    if min_quantity is not None:
+        clauses.append(Item.quantity >= min_quantity)
+        ranged.add("quantity")
+    if max_quantity is not None:
+        clauses.append(Item.quantity <= max_quantity)
+        ranged.add("quantity")
+    if created_after is not None:
+        clauses.append(Item.created_at >= _naive_utc(created_after))
+        ranged.add("created_at")
+    if created_before is not None:
+        clauses.append(Item.created_at < _naive_utc(created_before))
+        ranged.add("created_at")
+    if created_by is not None:
+        clauses.append(ITEM_CREATED_BY_KEY == created_by)
+
+    for by_creator, range_col, sorts in _INDEXED_ACCESS_PATHS:
+        if (
+            by_creator == (created_by is not None)
+            and ranged <= ({range_col} if range_col else set())
+            and sort in sorts
+        ):
+            return clauses
+    raise HTTPException(
+        status_code=400,
+        detail=(
+            f"No index serves filters on {sorted(ranged) or 'none'}"
+            f"{' + created_by' if created_by is not None else ''} sorted by '{sort}'. "
+            "Range-filter at most one column and sort by that same column "
+            "(created_by may be combined with created_at, or with sort=id/created_by)."
+        ),
+    )
+
+
+def _encode_cursor(sort: str, order: str, value: Any, last_id: int) -> str:
+    """Cursor that seeks past the row with sort key ``value`` and id ``last_id``."""
+    if value is None:
+        value = ""  # created_by sorts as coalesce(created_by, '')
+    payload = {
+        "s": sort,
+        "o": order,
+        "v": value.isoformat() if isinstance(value, datetime) else value,
+        "id": last_id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_clause(cursor: str, sort: str, order: str):
+    """Decode an opaque cursor into a WHERE clause that seeks past the last row."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = int(payload["id"])
+        value = payload["v"]
+        if isinstance(_SORT_KEYS[sort].type, DateTime):
+            value = datetime.fromisoformat(value)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort or payload.get("o") != order:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort/order")
+
+    col = _SORT_KEYS[sort]
+    if sort == "id":
+        return col > last_id if order == "asc" else col < last_id
+    key, last = tuple_(col, Item.id), tuple_(value, last_id)
+    return key > last if order == "asc" else key < last
+
+
+def _order_by(sort: str, order: str) -> list:
+    cols = [_SORT_KEYS[sort]] if sort == "id" else [_SORT_KEYS[sort], Item.id]
+    return [c.asc() if order == "asc" else c.desc() for c in cols]
+
+
+def _json_page_query(query, sort: str, order: str, page_size: int, offset: int = 0):
+    """Wrap a list page query (page_size + 1 rows) so Postgres renders the page as JSON.
+
+    Returns one row: ``items`` is the JSON array text of the first page_size
+    rows, in _item_to_dict's shape. ``has_more``, ``ids``/``versions`` (for
+    the ETag) and ``last_key``/``last_id`` (for the cursor) give the app
+    what it needs without parsing the JSON. ``offset`` must match the query's
+    OFFSET, since row_number() counts the skipped rows too.
+    """
+    page = query.add_columns(func.row_number().over(order_by=_order_by(sort, order)).label("rn")).subquery()
+    on_page = page.c.rn <= offset + page_size
+    last = page.c.rn == offset + page_size
+    item = func.json_build_object(
+        *[arg for field in _ITEM_FIELDS for arg in (literal_column(f"'{field}'"), page.c[field])]
+    )
+    return select(
+        cast(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(item, page.c.rn)).filter(on_page),
+                literal_column("'[]'::json"),
+            ),
+            Text,
+        ).label("items"),
+        (func.count() > page_size).label("has_more"),
+        func.array_agg(aggregate_order_by(page.c.id, page.c.rn)).filter(on_page).label("ids"),
+        func.array_agg(aggregate_order_by(page.c.version, page.c.rn)).filter(on_page).label("versions"),
+        func.min(page.c[sort]).filter(last).label("last_key"),
+        func.min(page.c.id).filter(last).label("last_id"),
+    )
+
+
+_counts_table_ready = False
+
+
+async def _count_items(
+    session: AsyncSession, strategy: str, clauses: list = (), created_by: str | None = None,
+) -> tuple[int | None, str]:
+    """Return (total, strategy_used) for the requested count strategy.
+
+    - exact: ``count(*)``, O(table size)
+    - estimated: planner statistics (``pg_class.reltuples``), O(1); unfiltered only
+    - maintained: trigger-maintained ``item_counts`` table, O(1); optionally per created_by
+    - none: skip counting
+
+    ``clauses`` are the list filters; ``created_by`` is passed separately so the
+    maintained counters can serve a created_by-only filter. Falls back to exact
+    when the cheaper source is unavailable (table never analyzed, counters not
+    installed by init-table, or filters the source can't answer).
+    """
+    global _counts_table_ready
+    if strategy == "none":
+        return None, "none"
+
+    only_created_by = len(clauses) == (0 if created_by is None else 1)
+    if strategy == "maintained" and only_created_by and not _counts_table_ready:
+        regclass = f"{ItemCount.__table_args__['schema']}.{ItemCount.__tablename__}"
+        found = await session.execute(select(func.to_regclass(regclass)))
+        _counts_table_ready = found.scalar() is not None
+    if strategy == "maintained" and only_created_by and _counts_table_ready:
+        query = select(func.coalesce(func.sum(ItemCount.n), 0))
+        if created_by is not None:
+            query = query.where(ItemCount.created_by == created_by)
+        # sum(bigint) is numeric in Postgres; asyncpg hands back a Decimal
+        return int((await session.execute(query)).scalar()), "maintained"
+
+    if strategy == "estimated" and not clauses:
+        schema = Item.__table_args__["schema"]
+        # A partitioned items table has no statistics of its own: sum its partitions
+        result = await session.execute(
+            text(
+                "SELECT CASE WHEN bool_and(reltuples < 0) THEN -1 "
+                "ELSE sum(greatest(reltuples, 0)) END::bigint FROM pg_class "
+                "WHERE (oid = to_regclass(:name) AND relkind <> 'p') "
+                "OR oid IN (SELECT relid FROM pg_partition_tree(to_regclass(:name)) WHERE isleaf)"
+            ),
+            {"name": f"{schema}.{Item.__tablename__}"},
+        )
+        estimate = result.scalar()
+        # reltuples is -1 until the first VACUUM/ANALYZE
+        if estimate is not None and estimate >= 0:
+            return estimate, "estimated"
+
+    query = select(func.count(Item.id)).where(*clauses)
+    return (await session.execute(query)).scalar() or 0, "exact"
+
+
+_stats_table_ready = False
+
+
+async def _item_stats(
+    session: AsyncSession, group_by: str, created_by: str | None,
+    day_from: date | None, day_to: date | None, limit: int,
+) -> tuple[Dict[str, Any], List[Dict[str, Any]], datetime | None, str]:
+    """Return (totals, groups, last_change_at, source) for /items/stats.
+
+    Reads the trigger-maintained ``item_stats`` rollup; until init-table has
+    created it, aggregates ``items`` directly (source "live", O(table size)).
+    """
+    global _stats_table_ready
+    if not _stats_table_ready:
+        regclass = f"{ItemStat.__table_args__['schema']}.{ItemStat.__tablename__}"
+        _stats_table_ready = (await session.execute(select(func.to_regclass(regclass)))).scalar() is not None
+
+    if _stats_table_ready:
+        source, table = "rollup", ItemStat
+        keys = {"created_by": ItemStat.created_by, "day": ItemStat.day}
+        measures = [
+            func.sum(ItemStat.items), func.sum(ItemStat.total_quantity), func.sum(ItemStat.stock_value),
+        ]
+        last_change = func.max(ItemStat.updated_at)
+    else:
+        source, table = "live", Item
+        keys = {"created_by": ITEM_CREATED_BY_KEY, "day": cast(Item.created_at, Date)}
+        measures = [
+            func.count(Item.id), func.sum(Item.quantity), func.sum(cast(Item.price, Numeric) * Item.quantity),
+        ]
+        last_change = func.max(Item.updated_at)
+
+    clauses = []
+    if created_by is not None:
+        clauses.append(keys["created_by"] == created_by)
+    if day_from is not None:
+        clauses.append(keys["day"] >= day_from)
+    if day_to is not None:
+        clauses.append(keys["day"] <= day_to)
+
+    def measures_dict(items, quantity, value) -> Dict[str, Any]:
+        # sum() over bigint/numeric comes back as Decimal
+        return {"items": int(items or 0), "total_quantity": int(quantity or 0), "stock_value": float(value or 0)}
+
+    totals_row = (await session.execute(
+        select(*measures, last_change).select_from(table).where(*clauses)
+    )).one()
+    groups = []
+    if group_by != "none":
+        key = keys[group_by]
+        rows = (await session.execute(
+            select(key, *measures).select_from(table).where(*clauses)
+            .group_by(key).having(measures[0] > 0).order_by(key).limit(limit)
+        )).all()
+        for row in rows:
+            value = row[0].isoformat() if group_by == "day" else (row[0] or None)
+            groups.append({group_by: value, **measures_dict(*row[1:])})
+    return measures_dict(*totals_row[:3]), groups, totals_row[3], source
+
+
+_trigram_ready = False
+# Names are short: mark the whole value. Descriptions: up to two short fragments.
+_NAME_HIGHLIGHT = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+_DESCRIPTION_HIGHLIGHT = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+# Highlights are HTML, so stored text is escaped ('&' first) before ts_headline
+# adds the <mark> tags. The parser reads each entity as one token, so
+# fragments never cut one in half.
+_HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#39;"))
+
+
+def _html_escape(column):
+    for char, entity in _HTML_ESCAPES:
+        column = func.replace(column, char, entity)
+    return column
+
+
+async def _trigram_available(session: AsyncSession) -> bool:
+    """Whether init-table managed to install pg_trgm (cached once true)."""
+    global _trigram_ready
+    if not _trigram_ready:
+        found = await session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+        _trigram_ready = found.scalar() is not None
+    return _trigram_ready
+
+
+def _search_query(q: str, fuzzy: bool, page: int, page_size: int):
+    """Rank matches in a subquery, then highlight only the page that is returned.
+
+    Full-text matches use ix_items_search_tsv; with ``fuzzy`` the trigram
+    indexes add word-similarity matches (``q <% column``), OR-ed via bitmap scans.
+    """
+    search_config = text(f"'{SEARCH_CONFIG}'::regconfig")
+    tsquery = func.websearch_to_tsquery(search_config, q)
+    match = ITEM_SEARCH_VECTOR.op("@@")(tsquery)
+    rank = func.ts_rank_cd(ITEM_SEARCH_VECTOR, tsquery)
+    if fuzzy:
+        term = literal(q)
+        match = match | term.op("<%")(Item.name) | term.op("<%")(Item.description)
+        rank = (
+            rank
+            + func.word_similarity(term, Item.name)
+            + func.word_similarity(term, func.coalesce(Item.description, "")) * 0.5
+        )
+
+    matched = (
+        select(Item.id, rank.label("rank"))
+        .where(match)
+        .order_by(rank.desc(), Item.id)
+        .offset((page - 1) * page_size)
+        .limit(page_size + 1)
+        .subquery()
+    )
+    return (
+        select(
+            *_ITEM_COLUMNS,
+            matched.c.rank,
+            func.ts_headline(search_config, _html_escape(Item.name), tsquery, _NAME_HIGHLIGHT),
+            func.ts_headline(
+                search_config, _html_escape(func.coalesce(Item.description, "")), tsquery, _DESCRIPTION_HIGHLIGHT,
+            ),
+        )
+        .join(matched, Item.id == matched.c.id)
+        .order_by(matched.c.rank.desc(), Item.id)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Import helpers
+# ---------------------------------------------------------------------------
+
+_IMPORT_COLUMNS = ("id", "name", "description", "price", "quantity")
+_INT4_RANGE = (-2**31, 2**31 - 1)
+# One CSV record may not grow past this while waiting for its closing quote.
+_IMPORT_MAX_RECORD_CHARS = 1024 * 1024
+# Rejected rows listed in the response; beyond this they are only counted,
+# so a huge max_errors can't grow the report without bound.
+_IMPORT_REPORTED_ERRORS = 1000
+
+
+class _ImportReport:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, row: int, error: str):
+        self.rejected += 1
+        if self.rejected > self.max_errors:
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": f"More than {self.max_errors} invalid rows; nothing was imported",
+                    "errors": self.errors,
+                },
+            )
+        if len(self.errors) < _IMPORT_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+
+def _import_int(value: Any, column: str) -> int:
+    try:
+        number = None if isinstance(value, float) and not value.is_integer() else int(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None:
+        raise ValueError(f"{column} is not an integer: {value!r}")
+    if not _INT4_RANGE[0] <= number <= _INT4_RANGE[1]:
+        raise ValueError(f"{column} out of range: {number}")
+    return number
+
+
+def _import_record(values: Dict[str, Any]) -> tuple:
+    """Validate one row into (id, name, description, price, quantity); raises ValueError."""
+    def present(column):
+        value = values.get(column)
+        return None if value is None or value == "" else value
+
+    name = present("name")
+    if name is None:
+        raise ValueError("name is required")
+    name = str(name)
+    if len(name) > 255:
+        raise ValueError("name longer than 255 characters")
+    description = present("description")
+    if description is not None:
+        description = str(description)
+        if len(description) > 1000:
+            raise ValueError("description longer than 1000 characters")
+    item_id = present("id")
+    price = present("price")
+    quantity = present("quantity")
+    try:
+        price = float(price) if price is not None else 0.0
+    except (TypeError, ValueError):
+        raise ValueError(f"price is not a number: {price!r}")
+    quantity = _import_int(quantity, "quantity") if quantity is not None else 0
+    item_id = _import_int(item_id, "id") if item_id is not None else None
+    return item_id, name, description, price, quantity
+
+
+def _csv_complete_prefix(text: str) -> int:
+    """Length of the longest prefix of ``text`` made of whole CSV records.
+
+    A newline ends a record only outside quotes, i.e. after an even number of
+    '"' characters (escaped quotes are doubled, so parity still holds).
+    """
+    total_quotes = text.count('"')
+    end = len(text)
+    while True:
+        newline = text.rfind("\n", 0, end)
+        if newline < 0:
+            return 0
+        if (total_quotes - text.count('"', newline)) % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+async def _csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Dict[str, Any]]]:
+    """Parse a streamed CSV upload (header row first) into (row number, values)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header: List[str] | None = None
+    carry = ""
+    row_number = 0
+    final = False
+    chunk_iter = chunks.__aiter__()
+    while not final:
+        try:
+            text = carry + decoder.decode(await chunk_iter.__anext__())
+        except StopAsyncIteration:
+            text = carry + decoder.decode(b"", final=True)
+            final = True
+        if final and text.count('"') % 2:
+            raise HTTPException(status_code=400, detail=f"Unterminated quoted field after row {row_number}")
+        cut = len(text) if final else _csv_complete_prefix(text)
+        if not final and cut == 0 and len(text) > _IMPORT_MAX_RECORD_CHARS:
+            raise HTTPException(status_code=400, detail=f"CSV record after row {row_number} is too long or has an unterminated quote")
+        complete, carry = text[:cut], text[cut:]
+        for record in csv.reader(io.StringIO(complete, newline="")):
+            if header is None:
+                header = [column.strip().lower() for column in record]
+                if "name" not in header:
+                    raise HTTPException(status_code=400, detail="CSV header must include a 'name' column")
+                continue
+            if not record:
+                continue
+            row_number += 1
+            yield row_number, dict(zip(header, record))
+    if header is None:
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+
+async def _parquet_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Dict[str, Any]]]:
+    """Spool the upload to disk (Parquet's footer comes last), then read it batch by batch."""
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            parquet = pq.ParquetFile(spool)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid Parquet file: {e}")
+        if "name" not in parquet.schema_arrow.names:
+            raise HTTPException(status_code=400, detail="Parquet schema must include a 'name' column")
+        columns = [c for c in _IMPORT_COLUMNS if c in parquet.schema_arrow.names]
+        batches = parquet.iter_batches(batch_size=EXPORT_BATCH_SIZE, columns=columns)
+        row_number = 0
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            for values in batch.to_pylist():
+                row_number += 1
+                yield row_number, values
+
+
+async def _import_records(rows: AsyncIterator[tuple[int, Dict[str, Any]]], report: _ImportReport):
+    """Validated COPY records (ord, id, name, description, price, quantity)."""
+    async for row_number, values in rows:
+        try:
+            record = _import_record(values)
+        except ValueError as e:
+            report.reject(row_number, str(e))
+            continue
+        report.accepted += 1
+        yield (row_number, *record)
+
+
+_IMPORT_MERGE_SQL = {
+    "insert": """
+        WITH inserted AS (
+            INSERT INTO {schema}.items (name, description, price, quantity, created_by, auth_mode)
+            SELECT name, description, price, quantity, $1, $2 FROM items_import_stage ORDER BY ord
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM inserted) AS inserted, 0 AS updated
+    """,
+    # Each id is merged once, from its last occurrence in the file: updated if it
+    # exists, otherwise inserted under a new id. Rows without an id are inserted.
+    "upsert": """
+        WITH latest AS (
+            SELECT DISTINCT ON (id) * FROM items_import_stage
+            WHERE id IS NOT NULL ORDER BY id, ord DESC
+        ), updated AS (
+            UPDATE {schema}.items i
+            SET name = s.name, description = s.description, price = s.price,
+                quantity = s.quantity, updated_by = $1, updated_at = now()
+            FROM latest s WHERE i.id = s.id
+            RETURNING i.id
+        ), inserted AS (
+            INSERT INTO {schema}.items (name, description, price, quantity, created_by, auth_mode)
+            SELECT s.name, s.description, s.price, s.quantity, $1, $2 FROM (
+                SELECT * FROM latest l
+                WHERE NOT EXISTS (SELECT 1 FROM {schema}.items i WHERE i.id = l.id)
+                UNION ALL
+                SELECT * FROM items_import_stage WHERE id IS NULL
+            ) s
+            ORDER BY s.ord
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM inserted) AS inserted, (SELECT count(*) FROM updated) AS updated
+    """,
+}
+
+
+# ---------------------------------------------------------------------------
+# Change feed helpers
+# ---------------------------------------------------------------------------
+
+def _sse(event: str, data: Dict[str, Any], token: item_feed.Token) -> str:
+    return f"id: {item_feed.encode_token(token)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _change_event(change: Dict[str, Any]) -> str:
+    return _sse(
+        "change",
+        {"op": change["op"], "id": change["id"], "changed_at": change["changed_at"]},
+        item_feed.event_token(change),
+    )
+
+
+async def _change_stream(request: Request, queue: asyncio.Queue, last: item_feed.Token, live_from: item_feed.Token):
+    """Replay (last, live_from] from the change log, then relay live events from ``queue``."""
+    try:
+        yield "retry: 3000\n\n"
+        if last < live_from:
+            session = await get_sp_session()
+            try:
+                while True:
+                    changes = await item_feed.read_changes(session, last, until=live_from)
+                    for change in changes:
+                        yield _change_event(change)
+                        last = item_feed.event_token(change)
+                    if len(changes) < item_feed.BATCH_SIZE:
+                        break
+            finally:
+                await session.close()
+        last = max(last, live_from)
+        yield _sse("ready", {}, last)
+
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=FEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            if change is None:
+                break  # fell behind; the client reconnects with Last-Event-ID and replays
+            if item_feed.event_token(change) <= last:
+                continue
+            yield _change_event(change)
+            last = item_feed.event_token(change)
+    except Exception as e:
+        logger.error(f"Change feed stream failed: {e}")
+    finally:
+        item_feed.unsubscribe(queue)
+
+
+# ---------------------------------------------------------------------------
+# Export helpers
+# ---------------------------------------------------------------------------
+
+_EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "items.ndjson"),
+    "csv": ("text/csv; charset=utf-8", "items.csv"),
+    "parquet": ("application/vnd.apache.parquet", "items.parquet"),
+}
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return "".join([json.dumps(_row_to_dict(row)) + "\n" for row in rows]).encode()
+
+
+def _csv_chunk(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(map(_row_values, rows))
+    return buf.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file handed to ParquetWriter; drained after every row group."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_writer(columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us")}
+    schema = pa.schema([(col.name, arrow_types[col.type.python_type]) for col in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write(rows) -> bytes:
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return sink.drain()
+
+    def close() -> bytes:
+        writer.close()
+        return sink.drain()
+
+    return write, close
+
+
+def _accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an Accept-Encoding header allows gzip (``gzip``/``x-gzip``, else ``*``, with q > 0)."""
+    qvalues = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            qvalues[coding] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+async def _export_stream(session: AsyncSession, fmt: str, gzip: bool, auth_mode: str):
+    """Single ordered pass over items through a server-side cursor, one chunk per batch."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+    exported = 0
+    try:
+        connection = await session.connection()
+        result = await connection.stream(
+            select(*_ITEM_COLUMNS).order_by(Item.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        if fmt == "parquet":
+            write_parquet, close_parquet = _parquet_writer(_ITEM_COLUMNS)
+        elif fmt == "csv":
+            chunk = (",".join(_ITEM_FIELDS) + "\r\n").encode()
+            yield compressor.compress(chunk) if compressor else chunk
+
+        async for rows in result.partitions():
+            if fmt == "parquet":
+                chunk = write_parquet(rows)
+            elif fmt == "csv":
+                chunk = _csv_chunk(rows)
+            else:
+                chunk = _ndjson_chunk(rows)
+            exported += len(rows)
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        tail = close_parquet() if fmt == "parquet" else b""
+        if compressor:
+            tail = compressor.compress(tail) + compressor.flush()
+        if tail:
+            yield tail
+        logger.info(f"Exported {exported} items as {fmt} ({auth_mode})")
+    except Exception as e:
+        # Headers are already sent; re-raising aborts the chunked response so the
+        # client sees a truncated transfer instead of a complete-looking file.
+        logger.error(f"Export failed after {exported} items ({auth_mode}): {e}")
+        raise
+    finally:
+        await session.close()
+
+
 # ---------------------------------------------------------------------------
 # Guard: return 503 when Lakebase is not configured
 # ---------------------------------------------------------------------------
@@ -149,8 +1286,11 @@ async def debug_headers(request: Request) -> Dict[str, Any]:
 
 
 @router.get("/lakebase/health")
-async def lakebase_health() -> Dict[str, Any]:
-    """Check Lakebase connectivity with diagnostic details."""
+async def lakebase_health(deep: bool = False) -> Dict[str, Any]:
+    """Report Lakebase connectivity from the background prober's cached snapshot.
+
+    ``?deep=true`` forces a live probe (rate-limited; see config/health.py).
+    """
     configured = is_configured()
     if not configured:
         return {
@@ -160,39 +1300,97 @@ async def lakebase_health() -> Dict[str, Any]:
             "error": "LAKEBASE_INSTANCE_NAME not set",
         }
 
-    check = await health_check()
+    probed = False
+    if deep or not health.get_snapshot():
+        snapshot, probed = await health.probe_now()
+    else:
+        snapshot = health.get_snapshot()
+    check = snapshot["lakebase"]
     return {
         "configured": True,
-        "connection_healthy": check["healthy"],
+        "connection_healthy": check["status"] == "healthy",
         "engine_initialized": check["engine_initialized"],
-        "status": "healthy" if check["healthy"] else "unhealthy",
+        "status": check["status"],
         "error": check.get("error"),
+        "latency_ms": check["latency_ms"],
+        "checked_at": check["checked_at"],
+        "cached": not probed,
+        "item_cache": item_cache.stats(),
+        "change_feed": item_feed.stats(),
+        "group_commit": group_commit.stats(),
+        "idempotency": idempotency.stats(),
+        "partitions": item_partitions.stats(),
+        "deadlines": deadlines.stats(),
+        "tracing": tracing.stats(),
+        "profiling": profiling.stats(),
     }
 
 
 @router.post("/lakebase/items", status_code=201)
-async def create_item(body: ItemCreate, request: Request) -> Dict[str, Any]:
-    """Create a new item."""
+async def create_item(
+    body: ItemCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = Header(None),
+) -> Dict[str, Any]:
+    """Create a new item.
+
+    SP-path inserts go through the group-commit coalescer when
+    LAKEBASE_GROUP_COMMIT is enabled (see config/group_commit.py), unless the
+    request carries an Idempotency-Key, which must commit with its own insert.
+    """
     _require_lakebase()
+    _check_idempotency_key(idempotency_key)
+    if group_commit.ENABLED and idempotency_key is None and _extract_user_token(request)[0] is None:
+        auth_mode = "service_principal"
+        try:
+            item = await group_commit.submit({
+                **body.model_dump(),
+                "created_by": _resolve_caller(request, auth_mode, None),
+                "auth_mode": auth_mode,
+            })
+        except Exception as e:
+            logger.error(f"Create item failed ({auth_mode}, group commit): {e}")
+            raise HTTPException(status_code=500, detail=f"Create failed: {e}")
+        item_cache.invalidate([item.id])
+        response.headers["ETag"] = _item_etag(item.id, item.version)
+        return {"item": _item_to_dict(item), "auth_mode": auth_mode}
+
     try:
         session, auth_mode, user_email = await _get_session(request)
     except Exception as e:
         logger.error(f"Failed to get Lakebase session: {e}")
         raise HTTPException(status_code=500, detail=f"Session failed: {e}")
+    caller = _resolve_caller(request, auth_mode, user_email)
     try:
-        item = Item(
-            name=body.name,
-            description=body.description,
-            price=body.price,
-            quantity=body.quantity,
-            created_by=_resolve_caller(request, auth_mode, user_email),
-            auth_mode=auth_mode,
+        if idempotency_key:
+            replay = await _claim_idempotency_key(session, request, caller, idempotency_key, body)
+            if replay is not None:
+                await session.commit()
+                return replay
+
+        # INSERT ... RETURNING hands back server defaults without a refresh SELECT
+        result = await session.execute(
+            insert(Item)
+            .values(
+                name=body.name,
+                description=body.description,
+                price=body.price,
+                quantity=body.quantity,
+                created_by=caller,
+                auth_mode=auth_mode,
+            )
+            .returning(Item)
         )
-        session.add(item)
+        item = result.scalars().one()
+        payload = {"item": _item_to_dict(item), "auth_mode": auth_mode}
+        if idempotency_key:
+            await idempotency.complete(session, caller, idempotency_key, 201, payload)
         await session.commit()
-        await session.refresh(item)
+        item_cache.invalidate([item.id])
 
-        return {"item": _item_to_dict(item), "auth_mode": auth_mode}
+        response.headers["ETag"] = _item_etag(item.id, item.version)
+        return payload
     except HTTPException:
         raise
     except Exception as e:
@@ -203,53 +1401,488 @@ async def create_item(body: ItemCreate, request: Request) -> Dict[str, Any]:
         await session.close()
 
 
+@router.post("/lakebase/items:bulk", status_code=201)
+async def bulk_create_items(
+    body: ItemBulkCreate, request: Request, idempotency_key: str | None = Header(None)
+) -> Dict[str, Any]:
+    """Create many items in one transaction.
+
+    Batches of multi-row INSERT ... RETURNING are used up to
+    LAKEBASE_BULK_COPY_THRESHOLD items; larger payloads are loaded with COPY.
+    Returns the generated id and timestamps for each item, in input order.
+    """
+    _require_lakebase()
+    _check_idempotency_key(idempotency_key)
+    try:
+        session, auth_mode, user_email = await _get_session(request)
+    except Exception as e:
+        logger.error(f"Failed to get Lakebase session: {e}")
+        raise HTTPException(status_code=500, detail=f"Session failed: {e}")
+    created_by = _resolve_caller(request, auth_mode, user_email)
+    rows = [
+        {**item.model_dump(), "created_by": created_by, "auth_mode": auth_mode}
+        for item in body.items
+    ]
+    method = "copy" if len(rows) > BULK_COPY_THRESHOLD else "insert"
+    try:
+        if idempotency_key:
+            replay = await _claim_idempotency_key(session, request, created_by, idempotency_key, body)
+            if replay is not None:
+                await session.commit()
+                return replay
+
+        if method == "copy":
+            created = await _bulk_insert_copy(session, rows)
+        else:
+            created = await _bulk_insert_values(session, rows)
+
+        payload = {
+            "items": [
+                {
+                    "id": row.id,
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": row.updated_at.isoformat(),
+                }
+                for row in created
+            ],
+            "count": len(created),
+            "method": method,
+            "created_by": created_by,
+            "auth_mode": auth_mode,
+        }
+        if idempotency_key:
+            await idempotency.complete(session, created_by, idempotency_key, 201, payload)
+        await session.commit()
+        item_cache.invalidate(row.id for row in created)
+        return payload
+    except HTTPException:
+        raise
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Bulk create of {len(rows)} items failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk create failed: {e}")
+    finally:
+        await session.close()
+
+
+@router.post("/lakebase/items/import")
+@deadlines.route_timeout(IMPORT_TIMEOUT)
+async def import_items(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    mode: str = Query("insert", pattern="^(insert|upsert)$"),
+    max_errors: int = Query(IMPORT_MAX_ERRORS, ge=0),
+) -> Dict[str, Any]:
+    """Load items from a streamed CSV or Parquet upload (raw request body).
+
+    Rows are validated as they arrive and piped through binary COPY into a
+    transaction-scoped staging table, then merged into items with one statement:
+    ``mode=insert`` inserts every row (any ``id`` column is ignored);
+    ``mode=upsert`` updates rows whose ``id`` exists and inserts the rest. A
+    repeated id is merged once, from its last row; a supplied id that doesn't
+    exist is not kept (the row is inserted under a new id).
+    Recognised columns are id, name (required), description, price and
+    quantity; others (e.g. from /items/export) are ignored. Invalid rows are
+    skipped and reported (the first 1000 listed, all counted in ``rejected``);
+    beyond ``max_errors`` the import is rolled back (422).
+    """
+    _require_lakebase()
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet import requires pyarrow")
+
+    session, auth_mode, user_email = await _get_session(request)
+    caller = _resolve_caller(request, auth_mode, user_email)
+    schema = Item.__table_args__["schema"]
+    report = _ImportReport(max_errors)
+    rows = _csv_rows(request.stream()) if format == "csv" else _parquet_rows(request.stream())
+    try:
+        await session.execute(text(
+            "CREATE TEMP TABLE items_import_stage ("
+            " ord BIGINT, id INTEGER, name VARCHAR(255), description VARCHAR(1000),"
+            " price DOUBLE PRECISION, quantity INTEGER"
+            ") ON COMMIT DROP"
+        ))
+        conn = await session.connection()
+        raw_conn = (await conn.get_raw_connection()).driver_connection
+        await raw_conn.copy_records_to_table(
+            "items_import_stage",
+            records=_import_records(rows, report),
+            columns=("ord", *_IMPORT_COLUMNS),
+            timeout=deadlines.timeout(IMPORT_TIMEOUT),
+        )
+        merged = await raw_conn.fetchrow(
+            _IMPORT_MERGE_SQL[mode].format(schema=schema), caller, auth_mode, timeout=deadlines.timeout(IMPORT_TIMEOUT),
+        )
+        await session.commit()
+        item_cache.invalidate(None)
+        logger.info(
+            f"Imported {report.accepted} items ({merged['inserted']} inserted, "
+            f"{merged['updated']} updated, {report.rejected} rejected, {auth_mode})"
+        )
+        return {
+            "received": report.accepted + report.rejected,
+            "inserted": merged["inserted"],
+            "updated": merged["updated"],
+            "rejected": report.rejected,
+            "errors": report.errors,
+            "mode": mode,
+            "auth_mode": auth_mode,
+        }
+    except HTTPException:
+        await session.rollback()
+        raise
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Import failed after {report.accepted} rows ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Import failed: {e}")
+    finally:
+        await session.close()
+
+
 @router.get("/lakebase/items")
 async def list_items(
     request: Request,
-    page: int = 1,
-    page_size: int = 20,
+    response: Response,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    count: str = Query(DEFAULT_COUNT_STRATEGY, pattern="^(exact|estimated|maintained|none)$"),
+    render: str = Query(DEFAULT_LIST_RENDER, pattern="^(app|db)$"),
+    name_prefix: str | None = Query(None, min_length=1),
+    min_price: float | None = None,
+    max_price: float | None = None,
+    min_quantity: int | None = None,
+    max_quantity: int | None = None,
+    created_by: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
 ) -> Dict[str, Any]:
-    """List items with pagination."""
+    """List items with pagination.
+
+    Pass ``cursor`` (the previous response's ``pagination.next_cursor``) for
+    keyset pagination, which costs the same on every page. Without a cursor the
+    legacy ``page``/``page_size`` OFFSET paging is used. Every response carries
+    ``next_cursor`` (None on the last page) so offset clients can switch over.
+
+    ``count`` picks how ``pagination.total`` is computed (see ``_count_items``);
+    ``pagination.total_strategy`` reports the strategy actually used.
+
+    ``render=db`` has Postgres build the items array with json_agg (see
+    ``_json_page_query``) and sends its text as is, bypassing the item cache.
+    Values are the same, but numbers and timestamps are printed Postgres'
+    way (``100`` rather than ``100.0``, no trailing zeros in fractional seconds).
+
+    Filters (name_prefix, min/max_price, min/max_quantity, created_by,
+    created_after/created_before) must be servable by one of the indexes in
+    models/items.py -- see ``_INDEXED_ACCESS_PATHS``; other combinations get 400.
+    """
     _require_lakebase()
+    if sort not in _SORT_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported sort '{sort}'; use one of {sorted(_SORT_KEYS)}",
+        )
+    clauses = _list_filter_clauses(
+        name_prefix, min_price, max_price, min_quantity, max_quantity,
+        created_by, created_after, created_before, sort,
+    )
+    query = select(*_ITEM_COLUMNS).where(*clauses).order_by(*_order_by(sort, order)).limit(page_size + 1)
+    offset = 0 if cursor else (page - 1) * page_size
+    if cursor:
+        query = query.where(_cursor_clause(cursor, sort, order))
+    else:
+        query = query.offset(offset)
+
+    # Early offset pages are hot; serve them from the shared cache on the SP path
+    cache_key = None
+    if render == "app" and not cursor and page <= item_cache.CACHE_MAX_PAGE and _extract_user_token(request)[0] is None:
+        cache_key = item_cache.page_key({
+            "page": page, "page_size": page_size, "sort": sort, "order": order, "count": count,
+            "name_prefix": name_prefix, "min_price": min_price, "max_price": max_price,
+            "min_quantity": min_quantity, "max_quantity": max_quantity, "created_by": created_by,
+            "created_after": created_after, "created_before": created_before,
+        })
+    if cache_key and item_cache.usable():
+        cached = item_cache.get(cache_key)
+        response.headers["X-Cache"] = "hit" if cached is not None else "miss"
+        if cached is not None:
+            etag = _page_etag(
+                [(i["id"], i["version"]) for i in cached["items"]],
+                cached["pagination"]["total"], cached["pagination"]["next_cursor"],
+            )
+            response.headers["ETag"] = etag
+            return _not_modified(request, etag) or {**cached, "auth_mode": "service_principal"}
+    read_generation = item_cache.generation()
+
     session, auth_mode, user_email = await _get_session(request)
     try:
-        count_result = await session.execute(select(func.count(Item.id)))
-        total = count_result.scalar() or 0
+        total, total_strategy = await _count_items(session, count, clauses, created_by)
+        pagination = {
+            "page": None if cursor else page,
+            "page_size": page_size,
+            "total": total,
+            "total_pages": None if total is None else (total + page_size - 1) // page_size,
+            "total_strategy": total_strategy,
+            "sort": sort,
+            "order": order,
+        }
+
+        if render == "db":
+            page_row = (await _execute_core(session, _json_page_query(query, sort, order, page_size, offset))).one()
+            next_cursor = (
+                _encode_cursor(sort, order, page_row.last_key, page_row.last_id) if page_row.has_more else None
+            )
+            etag = _page_etag(list(zip(page_row.ids or [], page_row.versions or [])), total, next_cursor)
+            not_modified = _not_modified(request, etag)
+            if not_modified:
+                return not_modified
+            # The items array is spliced in as Postgres rendered it; only the envelope is encoded here
+            envelope = json.dumps({"pagination": {**pagination, "next_cursor": next_cursor}, "auth_mode": auth_mode})
+            return Response(
+                content=b'{"items":' + page_row.items.encode() + b"," + envelope[1:].encode(),
+                media_type="application/json",
+                headers={"ETag": etag},
+            )
+
+        result = await _execute_core(session, query)
+        rows = result.all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(sort, order, getattr(rows[-1], sort), rows[-1].id) if has_more else None
+
+        # Compare before serializing: an unchanged page costs only the queries
+        etag = _page_etag(list(map(_row_etag_key, rows)), total, next_cursor)
+        response.headers["ETag"] = etag
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
+        body = {
+            "items": [_row_to_dict(r) for r in rows],
+            "pagination": {**pagination, "next_cursor": next_cursor},
+        }
+        if cache_key:
+            item_cache.put(cache_key, body, read_generation)
+        return {**body, "auth_mode": auth_mode}
+    except Exception as e:
+        logger.error(f"List items failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"List failed: {e}")
+    finally:
+        await session.close()
+
+
+@router.get("/lakebase/items/search")
+async def search_items(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+) -> Dict[str, Any]:
+    """Ranked full-text + fuzzy search over item name and description.
+
+    ``q`` uses web-search syntax (``"exact phrase"``, ``-exclude``, ``or``).
+    Rows match on the tsvector GIN index, or by trigram word similarity
+    (typo-tolerant) on name/description. Results are ordered by rank; only the
+    returned page gets ``<mark>``-highlighted snippets.
+    """
+    _require_lakebase()
+    session, auth_mode, user_email = await _get_session(request)
+    try:
+        fuzzy = await _trigram_available(session)
+        query = _search_query(q, fuzzy, page, page_size)
+        rows = (await _execute_core(session, query)).all()
+        has_more = len(rows) > page_size
+        return {
+            "items": [
+                {
+                    **_row_to_dict(row),
+                    "rank": round(row.rank, 4),
+                    "highlight": {"name": row[-2], "description": row[-1]},
+                }
+                for row in rows[:page_size]
+            ],
+            "pagination": {"page": page, "page_size": page_size, "has_more": has_more},
+            "query": q,
+            "fuzzy": fuzzy,
+            "auth_mode": auth_mode,
+        }
+    except Exception as e:
+        logger.error(f"Search items failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+    finally:
+        await session.close()
 
-        offset = (page - 1) * page_size
-        result = await session.execute(
-            select(Item).order_by(Item.id).offset(offset).limit(page_size)
-        )
-        items = result.scalars().all()
 
+@router.get("/lakebase/items/stats")
+async def item_stats(
+    request: Request,
+    group_by: str = Query("created_by", pattern="^(created_by|day|none)$"),
+    created_by: str | None = None,
+    day_from: date | None = Query(None, alias="from"),
+    day_to: date | None = Query(None, alias="to"),
+    limit: int = Query(1000, ge=1, le=10000),
+) -> Dict[str, Any]:
+    """Inventory aggregates: item count, total quantity and stock value (price x quantity).
+
+    Totals plus one row per ``created_by`` or per creation ``day`` (UTC), optionally
+    restricted by ``created_by`` and a ``from``/``to`` day range. Served from the
+    ``item_stats`` rollup, so cost depends on creators x days, not on item count.
+    The rollup is updated by triggers in the writing transaction: ``freshness``
+    reports it as never stale and gives the time of the last rolled-up change.
+    """
+    _require_lakebase()
+    session, auth_mode, user_email = await _get_session(request)
+    try:
+        totals, groups, last_change_at, source = await _item_stats(
+            session, group_by, created_by, day_from, day_to, limit,
+        )
         return {
-            "items": [_item_to_dict(i) for i in items],
-            "pagination": {
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "total_pages": (total + page_size - 1) // page_size if total else 0,
+            "totals": totals,
+            "groups": groups,
+            "group_by": group_by,
+            "source": source,
+            "freshness": {
+                "staleness_seconds": 0,
+                "maintained_by": "trigger" if source == "rollup" else None,
+                "last_change_at": last_change_at.isoformat() if last_change_at else None,
+                "as_of": datetime.now(timezone.utc).isoformat(),
             },
             "auth_mode": auth_mode,
         }
     except Exception as e:
-        logger.error(f"List items failed ({auth_mode}): {e}")
-        raise HTTPException(status_code=500, detail=f"List failed: {e}")
+        logger.error(f"Item stats failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Stats failed: {e}")
     finally:
         await session.close()
 
 
+@router.get("/lakebase/items/export")
+@deadlines.route_timeout(None)
+async def export_items(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    accept_encoding: str | None = Header(None),
+) -> StreamingResponse:
+    """Stream every item as NDJSON, CSV or Parquet in one pass over the table.
+
+    Rows come from a server-side cursor in batches of LAKEBASE_EXPORT_BATCH_SIZE
+    and are written to the response as they arrive, so memory stays constant
+    regardless of table size. NDJSON and CSV are gzip-compressed on the fly when
+    the client's ``Accept-Encoding`` allows gzip (q > 0); Parquet is already
+    zstd-compressed per column chunk (one row group per batch).
+    """
+    _require_lakebase()
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    media_type, filename = _EXPORT_FORMATS[format]
+    gzip = format != "parquet" and _accepts_gzip(accept_encoding)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    session, auth_mode, _ = await _get_session(request)
+    return StreamingResponse(
+        _export_stream(session, format, gzip, auth_mode), media_type=media_type, headers=headers,
+    )
+
+
+@router.get("/lakebase/items/changes")
+@deadlines.route_timeout(None)
+async def item_changes(
+    request: Request,
+    since: str | None = Query(None, description="Resume token (the id of the last event received)"),
+    last_event_id: str | None = Header(None),
+) -> StreamingResponse:
+    """Server-Sent Events stream of item inserts, updates and deletes.
+
+    Each ``change`` event carries ``{op, id, changed_at}``; fetch the row through
+    the normal endpoints if you need it. Event ids are resume tokens: reconnect
+    with ``Last-Event-ID`` (browsers' EventSource does this automatically) or
+    ``?since=`` to receive everything you missed, then live events. Without a
+    token the stream starts at the current position. A ``ready`` event marks
+    the switch to live delivery; a ``reset`` event means the token fell out of
+    the change log retention window and the client should re-list items.
+
+    All streams of a worker share one LISTEN connection and one change-log
+    reader (config/item_feed.py); the feed is read as the service principal.
+    """
+    _require_lakebase()
+    raw_token = last_event_id or since
+    try:
+        resume = item_feed.decode_token(raw_token) if raw_token else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid resume token: {raw_token}")
+
+    queue, live_from = await item_feed.subscribe()
+    prefix = ""
+    try:
+        if resume is not None:
+            session = await get_sp_session()
+            try:
+                if not await item_feed.token_retained(session, resume):
+                    prefix = _sse("reset", {"reason": "resume token expired"}, live_from)
+                    resume = None
+            finally:
+                await session.close()
+    except Exception as e:
+        item_feed.unsubscribe(queue)
+        logger.error(f"Change feed resume failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Change feed failed: {e}")
+
+    async def stream():
+        if prefix:
+            yield prefix
+        async for chunk in _change_stream(request, queue, resume or live_from, live_from):
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/lakebase/items/{item_id}")
-async def get_item(item_id: int, request: Request) -> Dict[str, Any]:
-    """Get a single item by ID."""
+async def get_item(item_id: int, request: Request, response: Response) -> Dict[str, Any]:
+    """Get a single item by ID (served from the item cache on the SP path).
+
+    Sends an ``ETag``; a matching ``If-None-Match`` gets an empty 304.
+    """
     _require_lakebase()
+    cacheable = _extract_user_token(request)[0] is None and item_cache.usable()
+    if cacheable:
+        cached = item_cache.get(item_cache.item_key(item_id))
+        response.headers["X-Cache"] = "hit" if cached is not None else "miss"
+        if cached is not None:
+            etag = _item_etag(item_id, cached["version"])
+            response.headers["ETag"] = etag
+            return _not_modified(request, etag) or {"item": cached, "auth_mode": "service_principal"}
+    read_generation = item_cache.generation()
+
     session, auth_mode, user_email = await _get_session(request)
     try:
-        result = await session.execute(select(Item).where(Item.id == item_id))
-        item = result.scalars().first()
-        if not item:
+        result = await _execute_core(session, select(*_ITEM_COLUMNS).where(Item.id == item_id))
+        row = result.first()
+        if not row:
             raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
-        return {"item": _item_to_dict(item), "auth_mode": auth_mode}
+        etag = _item_etag(row.id, row.version)
+        response.headers["ETag"] = etag
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        item_dict = _row_to_dict(row)
+        if cacheable:
+            item_cache.put(item_cache.item_key(item_id), item_dict, read_generation)
+        return {"item": item_dict, "auth_mode": auth_mode}
     except HTTPException:
         raise
     except Exception as e:
@@ -260,24 +1893,36 @@ async def get_item(item_id: int, request: Request) -> Dict[str, Any]:
 
 
 @router.put("/lakebase/items/{item_id}")
-async def update_item(item_id: int, body: ItemUpdate, request: Request) -> Dict[str, Any]:
-    """Update an existing item (partial update)."""
+async def update_item(item_id: int, body: ItemUpdate, request: Request, response: Response) -> Dict[str, Any]:
+    """Update an existing item (partial update).
+
+    With ``If-Match: "<id>-<version>"`` the update only applies if the row is
+    still at that version (checked in the UPDATE's WHERE clause); otherwise 412.
+    """
     _require_lakebase()
+    versions = _if_match_versions(request, item_id)
+    if versions == []:
+        raise HTTPException(status_code=412, detail=f"If-Match does not name a version of item {item_id}")
     session, auth_mode, user_email = await _get_session(request)
     try:
-        result = await session.execute(select(Item).where(Item.id == item_id))
-        item = result.scalars().first()
-        if not item:
-            raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
-
         update_data = body.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(item, field, value)
-
-        item.updated_by = _resolve_caller(request, auth_mode, user_email)
+        update_data["updated_by"] = _resolve_caller(request, auth_mode, user_email)
 
+        # One UPDATE ... RETURNING; an empty result means the row doesn't exist
+        # (or, with If-Match, has moved on to another version)
+        stmt = update(Item).where(Item.id == item_id)
+        if versions:
+            stmt = stmt.where(Item.version.in_(versions))
+        result = await session.execute(
+            stmt.values(**update_data).returning(Item),
+            execution_options={"synchronize_session": False},
+        )
+        item = result.scalars().first()
+        if not item:
+            await _precondition_failed(session, item_id, versions)
         await session.commit()
-        await session.refresh(item)
+        item_cache.invalidate([item_id])
+        response.headers["ETag"] = _item_etag(item.id, item.version)
         return {"item": _item_to_dict(item), "auth_mode": auth_mode}
     except HTTPException:
         raise
@@ -291,17 +1936,24 @@ async def update_item(item_id: int, body: ItemUpdate, request: Request) -> Dict[
 
 @router.delete("/lakebase/items/{item_id}")
 async def delete_item(item_id: int, request: Request) -> Dict[str, Any]:
-    """Delete an item."""
+    """Delete an item (honours ``If-Match`` like update_item)."""
     _require_lakebase()
+    versions = _if_match_versions(request, item_id)
+    if versions == []:
+        raise HTTPException(status_code=412, detail=f"If-Match does not name a version of item {item_id}")
     session, auth_mode, user_email = await _get_session(request)
     try:
-        result = await session.execute(select(Item).where(Item.id == item_id))
-        item = result.scalars().first()
-        if not item:
-            raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
-
-        await session.delete(item)
+        stmt = delete(Item).where(Item.id == item_id)
+        if versions:
+            stmt = stmt.where(Item.version.in_(versions))
+        result = await session.execute(
+            stmt.returning(Item.id),
+            execution_options={"synchronize_session": False},
+        )
+        if result.scalar() is None:
+            await _precondition_failed(session, item_id, versions)
         await session.commit()
+        item_cache.invalidate([item_id])
         return {"deleted": item_id, "auth_mode": auth_mode}
     except HTTPException:
         raise
@@ -313,7 +1965,101 @@ async def delete_item(item_id: int, request: Request) -> Dict[str, Any]:
         await session.close()
 
 
+@router.post("/lakebase/items:bulk-update")
+async def bulk_update_items(
+    body: ItemBulkUpdate, request: Request, idempotency_key: str | None = Header(None)
+) -> Dict[str, Any]:
+    """Apply the same partial update to every selected item in one UPDATE ... RETURNING."""
+    _require_lakebase()
+    _check_idempotency_key(idempotency_key)
+    update_data = body.set.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="'set' must contain at least one field")
+    clauses = _selector_clauses(body)
+    session, auth_mode, user_email = await _get_session(request)
+    caller = _resolve_caller(request, auth_mode, user_email)
+    try:
+        if idempotency_key:
+            replay = await _claim_idempotency_key(session, request, caller, idempotency_key, body)
+            if replay is not None:
+                await session.commit()
+                return replay
+
+        update_data["updated_by"] = caller
+        result = await session.execute(
+            update(Item).where(_bounded_selection(body, clauses)).values(**update_data).returning(Item),
+            execution_options={"synchronize_session": False},
+        )
+        items = result.scalars().all()
+        await _enforce_max_affected(session, body, len(items))
+
+        affected = {i.id: {"item": _item_to_dict(i)} for i in items}
+        payload = {
+            "results": _per_id_results(body.ids, affected, "updated"),
+            "updated": len(items),
+            "auth_mode": auth_mode,
+        }
+        if idempotency_key:
+            await idempotency.complete(session, caller, idempotency_key, 200, payload)
+        await session.commit()
+        item_cache.invalidate(affected)
+        return payload
+    except HTTPException:
+        raise
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Bulk update failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk update failed: {e}")
+    finally:
+        await session.close()
+
+
+@router.post("/lakebase/items:bulk-delete")
+async def bulk_delete_items(
+    body: ItemSelector, request: Request, idempotency_key: str | None = Header(None)
+) -> Dict[str, Any]:
+    """Delete every selected item in one DELETE ... RETURNING."""
+    _require_lakebase()
+    _check_idempotency_key(idempotency_key)
+    clauses = _selector_clauses(body)
+    session, auth_mode, user_email = await _get_session(request)
+    try:
+        if idempotency_key:
+            caller = _resolve_caller(request, auth_mode, user_email)
+            replay = await _claim_idempotency_key(session, request, caller, idempotency_key, body)
+            if replay is not None:
+                await session.commit()
+                return replay
+
+        result = await session.execute(
+            delete(Item).where(_bounded_selection(body, clauses)).returning(Item.id),
+            execution_options={"synchronize_session": False},
+        )
+        deleted_ids = result.scalars().all()
+        await _enforce_max_affected(session, body, len(deleted_ids))
+
+        payload = {
+            "results": _per_id_results(body.ids, {i: {} for i in deleted_ids}, "deleted"),
+            "deleted": len(deleted_ids),
+            "auth_mode": auth_mode,
+        }
+        if idempotency_key:
+            await idempotency.complete(session, caller, idempotency_key, 200, payload)
+        await session.commit()
+        item_cache.invalidate(deleted_ids)
+        return payload
+    except HTTPException:
+        raise
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Bulk delete failed ({auth_mode}): {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk delete failed: {e}")
+    finally:
+        await session.close()
+
+
 @router.post("/lakebase/init-table", status_code=201)
+@deadlines.route_timeout(None)
 async def init_table(request: Request) -> Dict[str, Any]:
     """Create the items table if it doesn't exist. Admin/setup endpoint."""
     _require_lakebase()
@@ -324,17 +2070,56 @@ async def init_table(request: Request) -> Dict[str, Any]:
 
     try:
         async with lb_engine.begin() as conn:
+            if item_partitions.PARTITIONED:
+                await item_partitions.create_table(conn)
             await conn.run_sync(Base.metadata.create_all)
+            # create_all skips indexes of tables that already exist
+            for index in Item.__table__.indexes:
+                await conn.run_sync(index.create, checkfirst=True)
 
         migrations = [
             "ALTER TABLE {schema}.items ADD COLUMN IF NOT EXISTS auth_mode VARCHAR(50)",
+            "ALTER TABLE {schema}.items ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
         ]
         schema = Item.__table_args__["schema"]
         async with lb_engine.begin() as conn:
             for stmt in migrations:
                 await conn.execute(text(stmt.format(schema=schema)))
 
-        return {"status": "ok", "message": "Items table created / migrated"}
+        async with lb_engine.begin() as conn:
+            for stmt in ITEM_VERSION_DDL:
+                await conn.execute(text(stmt.format(schema=schema)))
+            for stmt in ITEM_COUNTS_DDL:
+                await conn.execute(text(stmt.format(schema=schema)))
+            for stmt in ITEM_STATS_DDL:
+                await conn.execute(text(stmt.format(schema=schema)))
+            for stmt in ITEM_NOTIFY_DDL:
+                await conn.execute(text(stmt.format(
+                    schema=schema, channel=ITEM_CHANGES_CHANNEL, max_ids=ITEM_CHANGES_MAX_IDS,
+                )))
+
+        async with lb_engine.begin() as conn:
+            partitioned = await item_partitions.is_partitioned(conn)
+            if partitioned:
+                await item_partitions.ensure_partitions(conn)
+
+        # Fuzzy search is optional: skip the trigram indexes if pg_trgm can't be installed
+        fuzzy_search = True
+        try:
+            async with lb_engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for stmt in ITEM_TRGM_INDEX_DDL:
+                    await conn.execute(text(stmt.format(schema=schema)))
+        except Exception as e:
+            fuzzy_search = False
+            logger.warning(f"pg_trgm unavailable, fuzzy search disabled: {e}")
+
+        return {
+            "status": "ok",
+            "message": "Items table created / migrated",
+            "fuzzy_search": fuzzy_search,
+            "partitioned": partitioned,
+        }
     except Exception as e:
         logger.error(f"Init table failed: {e}")
         raise HTTPException(status_code=500, detail=f"Table init failed: {e}")
@@ -2,14 +2,18 @@ import logging
 from typing import Any, Dict, List, Tuple
 
 import requests as http_requests
-from databricks.sdk.core import Config
 from fastapi import APIRouter, HTTPException, Request
 
+import config.deadlines as deadlines
+import config.metrics as metrics
+import config.tracing as tracing
+from config.databricks import get_host
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-_cfg = Config()
-_host = _cfg.host
+# Client timeout for SCIM /Me, shortened to the request's remaining deadline
+SCIM_TIMEOUT = 15
 
 
 def get_user_info(request: Request) -> Dict[str, Any]:
@@ -28,11 +32,12 @@ def _verify_and_fetch_groups(token: str) -> Tuple[str, List[str]]:
     Works with both user OAuth tokens (x-forwarded-access-token) and
     notebook native tokens (X-User-Token). Returns (email, groups).
     """
-    resp = http_requests.get(
-        f"{_host}/api/2.0/preview/scim/v2/Me",
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=15,
-    )
+    with metrics.stage("scim"):
+        resp = http_requests.get(
+            f"{get_host()}/api/2.0/preview/scim/v2/Me",
+            headers=tracing.inject({"Authorization": f"Bearer {token}"}),
+            timeout=deadlines.timeout(SCIM_TIMEOUT),
+        )
     resp.raise_for_status()
     data = resp.json()
     email = data.get("userName", "")
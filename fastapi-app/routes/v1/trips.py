@@ -1,21 +1,23 @@
 import os
+import threading
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Any, Dict, List
 
-from databricks import sql
-from databricks.sdk.core import Config
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 
+import config.deadlines as deadlines
+import config.metrics as metrics
+import config.tracing as tracing
+from config.databricks import get_config, get_server_hostname
+
 from .me import get_user_info
 
 router = APIRouter()
 
 DATABRICKS_WAREHOUSE_ID = os.environ.get("DATABRICKS_WAREHOUSE_ID")
 
-databricks_cfg = Config()
-SERVER_HOSTNAME = databricks_cfg.host.removeprefix("https://").rstrip("/")
 HTTP_PATH = f"/sql/1.0/warehouses/{DATABRICKS_WAREHOUSE_ID}" if DATABRICKS_WAREHOUSE_ID else None
 
 SQL_QUERY = os.environ.get(
@@ -23,6 +25,9 @@ SQL_QUERY = os.environ.get(
     "SELECT * FROM samples.nyctaxi.trips LIMIT 5",
 )
 
+# Default deadline of /trips, long enough for a stopped warehouse to start
+SQL_QUERY_TIMEOUT = float(os.environ.get("SQL_QUERY_TIMEOUT", "120"))
+
 
 def make_serializable(value: Any) -> Any:
     """Convert SQL result values to JSON-safe types."""
@@ -47,29 +52,47 @@ def row_to_dict(row, columns: List[str]) -> Dict[str, Any]:
 
 
 def run_query(sql_query: str, access_token: str | None = None) -> List[Dict[str, Any]]:
-    """Execute SQL. Uses user token if provided, otherwise service principal."""
+    """Execute SQL. Uses user token if provided, otherwise service principal.
+
+    Under a request deadline the statement is cancelled on the warehouse when
+    the deadline passes, instead of running on after the client gave up.
+    """
+    # Deferred: the connector pulls in thrift/pyarrow and is only needed here.
+    from databricks import sql
+
     if access_token:
         conn = sql.connect(
-            server_hostname=SERVER_HOSTNAME,
+            server_hostname=get_server_hostname(),
             http_path=HTTP_PATH,
             access_token=access_token,
         )
     else:
+        databricks_cfg = get_config()
         conn = sql.connect(
-            server_hostname=SERVER_HOSTNAME,
+            server_hostname=get_server_hostname(),
             http_path=HTTP_PATH,
             credentials_provider=lambda: databricks_cfg.authenticate,
         )
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql_query)
-            result = cursor.fetchall()
+            timeout = deadlines.timeout()
+            canceller = threading.Timer(timeout, cursor.cancel) if timeout is not None else None
+            if canceller:
+                canceller.start()
+            try:
+                with tracing.span("warehouse_query", tracing.KIND_CLIENT):
+                    cursor.execute(sql_query)
+                    result = cursor.fetchall()
+            finally:
+                if canceller:
+                    canceller.cancel()
             columns = [col[0] for col in cursor.description]
             return [row_to_dict(row, columns) for row in result]
     finally:
         conn.close()
 
 
+@metrics.records_auth_mode
 def _extract_user_token(request: Request) -> tuple[str | None, str]:
     """Extract a Databricks access token from the request.
 
@@ -96,6 +119,7 @@ def _extract_user_token(request: Request) -> tuple[str | None, str]:
 
 
 @router.get("/trips")
+@deadlines.route_timeout(SQL_QUERY_TIMEOUT)
 def get_trips(request: Request) -> JSONResponse:
     """Query a table and return results."""
     user_token, auth_mode = _extract_user_token(request)